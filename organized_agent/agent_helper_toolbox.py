@@ -1,58 +1,193 @@
-from openai import OpenAI
 import os
-import json
 from datetime import datetime
 import re
+import time
+from organized_agent.llm_cache import get_llm_cache, make_cache_key
+from organized_agent.llm_pool import LLMPool
+from organized_agent.problem_store import problem_field
+from organized_agent.profiling import prompt_savings, record_llm_call
+from organized_agent.results_writer import get_results_writer, read_results
 
-client = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "http://localhost:11434/v1")
+# comma-separated OpenAI-compatible servers (e.g. one Ollama per GPU); requests go to the least loaded one
+LLM_ENDPOINTS = [url.strip() for url in os.environ.get("LLM_ENDPOINTS", LLM_BASE_URL).split(",") if url.strip()]
+client = LLMPool(LLM_ENDPOINTS, api_key="ollama")
 
 MODEL = "gemma3:27b"
 TEMPERATURE = 0.5 
 
 PROCESSED_DIR = os.path.join("data", "processed")
-RESULTS_FILE = os.path.join(PROCESSED_DIR, "results_log.jsonl")
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
-def get_text_response(prompt: str) -> str:
-    """Get text response from LLM which will help with our logical reasoning"""
-    system_message = {
-        "role": "system",
-        "content": "You are an expert Python code analyst. Be concise and technical."
-    }
+def set_client(new_client):
+    """Point every model call at another OpenAI-compatible client (e.g. a mock for benchmarks)."""
+    global client
+    client = new_client
+
+SYSTEM_PROMPT = "You are an expert Python code analyst. Be concise and technical."
+
+def build_messages(prompt: str, system_prompt: str = None) -> list:
+    system_message = {"role": "system", "content": system_prompt or SYSTEM_PROMPT}
     user_message = {"role": "user", "content": prompt}
+    return [system_message, user_message]
+
+def get_text_response(prompt: str, sample_index: int = None, system_prompt: str = None, json_mode: bool = False) -> str:
+    """
+    Get text response from LLM which will help with our logical reasoning.
+    Responses are served from / stored in the on-disk LLM cache; pass a
+    sample_index to draw a distinct, still reproducible sample for the same prompt.
+    system_prompt replaces the default SYSTEM_PROMPT; json_mode asks the server
+    for a JSON object (response_format), which Ollama enforces while decoding.
+    """
+    messages = build_messages(prompt, system_prompt)
 
+    cache = get_llm_cache()
+    cache_key = make_cache_key(MODEL, TEMPERATURE, messages, sample_index, variant="json" if json_mode else None)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        record_llm_call(0.0, cached=True)
+        return cached
+
+    extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+    start = time.perf_counter()
     response = client.chat.completions.create(
         model=MODEL,
-        messages=[system_message, user_message],
+        messages=messages,
         temperature=TEMPERATURE,
+        **extra,
+    )
+    usage = getattr(response, "usage", None)
+    record_llm_call(
+        time.perf_counter() - start,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+    )
+    text = response.choices[0].message.content.strip()
+    cache.put(cache_key, MODEL, text)
+    return text
+
+def stream_text_response(prompt: str, should_stop=None, stop_rule: str = None, sample_index: int = None, cancel=None,
+                         system_prompt: str = None):
+    """
+    Stream a completion and hang up as soon as should_stop(text) returns a
+    (possibly trimmed) final text instead of None, so the server stops decoding.
+    stop_rule names the stopping logic and is part of the cache key. Setting
+    the cancel event abandons the request; the partial text is not cached.
+
+    Returns (text, stats) where stats holds ttft_s, total_s, tokens_streamed
+    (content chunks, one token each on Ollama), stopped_early, cancelled and cached.
+    """
+    messages = build_messages(prompt, system_prompt)
+    stats = {"ttft_s": None, "total_s": 0.0, "tokens_streamed": 0, "stopped_early": False, "cancelled": False, "cached": False}
+
+    cache = get_llm_cache()
+    cache_key = make_cache_key(MODEL, TEMPERATURE, messages, sample_index, variant=stop_rule)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        stats["cached"] = True
+        record_llm_call(0.0, cached=True)
+        return cached, stats
+
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=TEMPERATURE,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    text = ""
+    final_text = None
+    usage = None
+    try:
+        for chunk in stream:
+            # the usage chunk only arrives when the stream runs to completion
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if cancel is not None and cancel.is_set():
+                stats["cancelled"] = True
+                break
+            if not delta:
+                continue
+            if stats["ttft_s"] is None:
+                stats["ttft_s"] = time.perf_counter() - start
+            stats["tokens_streamed"] += 1
+            text += delta
+
+            # only re-check once a line is complete
+            if should_stop is not None and "\n" in delta:
+                final_text = should_stop(text)
+                if final_text is not None:
+                    stats["stopped_early"] = True
+                    break
+    finally:
+        # closing the HTTP response makes the server abort the generation
+        stream.close()
+
+    stats["total_s"] = time.perf_counter() - start
+    record_llm_call(
+        stats["total_s"],
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None) or stats["tokens_streamed"],
     )
-    return response.choices[0].message.content.strip()
+    if stats["cancelled"]:
+        return text, stats
+    text = (final_text if final_text is not None else text).strip()
+    cache.put(cache_key, MODEL, text)
+    return text, stats
 
 def log_result_to_jsonl(state: dict):
     """
-    Append the final state (or relevant info) to results_log.jsonl.
-    Keeps one JSON object per line.
+    Submit the final state (or relevant info) to the shared results writer,
+    which appends it to the results log in the background.
     """
     record = {
+        "run_id": state.get("run_id"),
         "task_id": state.get("problem_id"),
         "result": state.get("result"),
+        "score": state.get("score"),
         "retries": state.get("retries"),
-        "failure_symptoms": state.get("failure_symptoms"),
+        "stop_reason": state.get("stop_reason"),
+        "samples_tested": state.get("samples_tested"),
+        "failure_symptoms": problem_field(state, "failure_symptoms"),
         "bug_type": state.get("bug_type"),
         "error_type": state.get("error_type"),
         "error_hint": state.get("error_hint"),
         "reasoning": state.get("reasoning"),
+        "reasoning_source": state.get("reasoning_source"),
         "fixed_code": state.get("fixed_code"),
         "test_output": state.get("test_output"),
+        "error_signature": state.get("error_signature"),
+        "history": state.get("history"),
+        "perf": state.get("perf") or None,
+        "speculative_hit": (state.get("speculative") or {}).get("hit"),
+        "speculative": state.get("speculative") or None,
         "entry_point": state.get("entry_point"),
+        "graph_variant": state.get("graph_variant") or "two_call",
+        "profile": state.get("profile"),
+        "profile_summary": state.get("profile_summary"),
+        **prompt_savings(state.get("profile_summary")),
         "timestamp": datetime.now().isoformat(),
     }
 
-    with open(RESULTS_FILE, "a") as f:
-        json.dump(record, f)
-        f.write("\n")
+    writer = get_results_writer()
+    writer.submit(record)
+    print(f"Logged result for {record['task_id']} to {writer.path}")
 
-    print(f"Logged result for {record['task_id']} to {RESULTS_FILE}")
+def read_logged_results(run_id: str) -> dict:
+    """Map task_id -> record for the tasks of run_id that already have a terminal result."""
+    writer = get_results_writer()
+    # records still queued in the writer must count as logged
+    writer.flush()
+    completed = {}
+    for record in read_results(writer.path_base, writer.fmt):
+        if record.get("run_id") == run_id and record.get("result") in ("pass", "fail"):
+            completed[record["task_id"]] = record
+    return completed
 
 def extract_error_hint(test_output: str, error_type: str = None) -> str:
     """
@@ -72,7 +207,13 @@ def extract_error_hint(test_output: str, error_type: str = None) -> str:
         "NameError": "NameError: Some variable or function is NOT defined, or defined wrongly. Make sure all identifiers are declared.",
         "SyntaxError": "SyntaxError: Generated code may have invalid Python syntax. Recheck indentation, parentheses, or missing colons.",
         "ZeroDivisionError": "ZeroDivisionError: Avoid dividing by zero — add a conditional guard.",
-        "RecursionError": "RecursionError: Infinite recursion detected — add base conditions or iterative logic."
+        "RecursionError": "RecursionError: Infinite recursion detected — add base conditions or iterative logic.",
+        "TimeoutError": "TimeoutError: The tests did not finish in time. Look for infinite loops, missing loop updates or exponential recursion.",
+        "MemoryError": "MemoryError: The code used too much memory. Avoid building huge intermediate lists or unbounded growth.",
+        "SandboxCrash": "SandboxCrash: The test process died. Avoid unbounded recursion depth, sys.exit() or other process-level side effects.",
+        "ModuleNotFoundError": "ModuleNotFoundError: Only the Python standard library is available. Remove third-party imports and implement the logic directly.",
+        "MissingReturn": "MissingReturn: Some path through the function ends without a return statement, so it returns None. Make sure every branch returns a value of the expected type.",
+        "PerformanceError": "PerformanceError: The fix gives correct results but is far slower than the reference solution. Avoid exponential recursion, repeated copying or rescanning of the input and nested loops where a single pass or a set/dict lookup does."
     }
 
     # look for known error names in the traceback
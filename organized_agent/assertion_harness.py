@@ -0,0 +1,215 @@
+import ast
+from concurrent.futures import ThreadPoolExecutor
+
+# split the assertions of one test run over this many sandbox workers (1 = one run)
+ASSERTION_PARALLELISM = 1
+
+MAX_REPR_CHARS = 200
+MAX_REPORTED_FAILURES = 10
+
+RESULTS_NAME = "_he_results"
+
+_COMPARE_OPS = {
+    ast.Eq: "eq",
+    ast.NotEq: "ne",
+    ast.Lt: "lt",
+    ast.LtE: "le",
+    ast.Gt: "gt",
+    ast.GtE: "ge",
+    ast.Is: "is_",
+    ast.IsNot: "is_not",
+    ast.In: "in",
+    ast.NotIn: "not_in",
+}
+
+# defines the recorder the rewritten asserts call; {partition} is (part, parts)
+_PRELUDE = '''
+import operator as _he_operator
+
+_he_results = []
+_he_partition = {partition}
+_HE_OPS = {{
+    "eq": _he_operator.eq, "ne": _he_operator.ne, "lt": _he_operator.lt, "le": _he_operator.le,
+    "gt": _he_operator.gt, "ge": _he_operator.ge, "is_": _he_operator.is_, "is_not": _he_operator.is_not,
+    "in": lambda a, b: a in b, "not_in": lambda a, b: a not in b,
+}}
+
+def _he_repr(value):
+    try:
+        text = repr(value)
+    except Exception as e:
+        text = f"<unrepresentable: {{type(e).__name__}}>"
+    return text if len(text) <= {max_repr} else text[:{max_repr}] + "..."
+
+def _he_check(idx, thunk, op):
+    if idx % _he_partition[1] != _he_partition[0]:
+        return
+    try:
+        value = thunk()
+        if op == "truthy":
+            ok, actual, expected = bool(value), value, "a truthy value"
+        elif op == "falsy":
+            ok, actual, expected = not value, value, "a falsy value"
+        else:
+            actual, expected = value
+            ok = bool(_HE_OPS[op](actual, expected))
+    except Exception as e:
+        _he_results.append((idx, False, f"{{type(e).__name__}}: {{e}}"[:{max_repr}], None, None))
+        return
+    if ok:
+        _he_results.append((idx, True, None, None, None))
+    else:
+        _he_results.append((idx, False, None, _he_repr(actual), _he_repr(expected)))
+'''
+
+
+class _AssertRewriter(ast.NodeTransformer):
+    """Replace every `assert` with a recorded _he_check(idx, thunk, op) call."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.asserts = []
+
+    def visit_Assert(self, node: ast.Assert):
+        idx = len(self.asserts)
+        self.asserts.append((node.lineno, ast.get_source_segment(self.source, node) or ast.unparse(node)))
+
+        test = node.test
+        if isinstance(test, ast.Compare) and len(test.ops) == 1 and type(test.ops[0]) in _COMPARE_OPS:
+            body = ast.Tuple(elts=[test.left, test.comparators[0]], ctx=ast.Load())
+            op = _COMPARE_OPS[type(test.ops[0])]
+        elif isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+            body, op = test.operand, "falsy"
+        else:
+            body, op = test, "truthy"
+
+        thunk = ast.Lambda(
+            args=ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=body,
+        )
+        call = ast.Call(
+            func=ast.Name(id="_he_check", ctx=ast.Load()),
+            args=[ast.Constant(idx), thunk, ast.Constant(op)],
+            keywords=[],
+        )
+        return ast.copy_location(ast.Expr(value=call), node)
+
+
+def rewrite_tests(test_code: str):
+    """
+    Rewrite the dataset tests so each assert is evaluated and recorded on its
+    own instead of stopping the run. Returns (rewritten_code, asserts) where
+    asserts lists (line, source) per assert index, or None when the tests
+    cannot be rewritten (unparsable or without asserts).
+    """
+    try:
+        tree = ast.parse(test_code)
+    except SyntaxError:
+        return None
+    rewriter = _AssertRewriter(test_code)
+    tree = ast.fix_missing_locations(rewriter.visit(tree))
+    if not rewriter.asserts:
+        return None
+    return ast.unparse(tree), rewriter.asserts
+
+
+def _group_by_assert(records: list) -> dict:
+    """
+    assert index -> {runs, failed, first_failure}. An assert inside a loop is
+    recorded once per iteration; it counts as one assert that passes only if
+    every iteration did. Insertion order follows the first evaluation.
+    """
+    grouped = {}
+    for record in records:
+        group = grouped.setdefault(record[0], {"runs": 0, "failed": 0, "first_failure": None})
+        group["runs"] += 1
+        if not record[1]:
+            group["failed"] += 1
+            if group["first_failure"] is None:
+                group["first_failure"] = record
+    return grouped
+
+
+def _report(grouped: dict, asserts: list, total: int):
+    """Summary line, one entry per failing assert and the error type of the first failure."""
+    failing = [group for group in grouped.values() if group["failed"]]
+    passed = len(grouped) - len(failing)
+    lines = [f"Assertion results: {passed}/{total} passed"]
+    for group in failing[:MAX_REPORTED_FAILURES]:
+        idx, _, error, actual, expected = group["first_failure"]
+        line, source = asserts[idx]
+        lines.append(f"FAILED line {line}: {source}")
+        if group["runs"] > 1:
+            lines.append(f"    failed {group['failed']} of {group['runs']} loop iterations, first failure:")
+        if error:
+            lines.append(f"    raised {error}")
+        else:
+            lines.append(f"    actual:   {actual}")
+            lines.append(f"    expected: {expected}")
+    if len(failing) > MAX_REPORTED_FAILURES:
+        lines.append(f"... and {len(failing) - MAX_REPORTED_FAILURES} more failing assertions")
+
+    error_type = "AssertionError"
+    if failing and failing[0]["first_failure"][2]:
+        error_type = failing[0]["first_failure"][2].split(":", 1)[0]
+    return "\n".join(lines), error_type, passed, len(failing)
+
+
+def run_assertions(pool, fixed_code: str, test_code: str, parallelism: int = None):
+    """
+    Run the candidate against per-assertion tests in the sandbox pool and
+    return a sandbox-style outcome extended with passed, total, score and
+    assertions (the failure report), plus runs: the raw sandbox outcomes.
+    Returns None when the tests cannot be rewritten, so the caller can fall
+    back to a plain run. With parallelism > 1 the asserts are split by index
+    over that many concurrent runs.
+    """
+    rewritten = rewrite_tests(test_code)
+    if rewritten is None:
+        return None
+    test_body, asserts = rewritten
+    parts = max(1, min(parallelism or ASSERTION_PARALLELISM, len(asserts)))
+
+    def run_part(part):
+        prelude = _PRELUDE.format(partition=(part, parts), max_repr=MAX_REPR_CHARS)
+        # candidate first so its line numbers in tracebacks stay unchanged
+        return pool.run(f"{fixed_code}\n\n{prelude}\n{test_body}", collect=RESULTS_NAME)
+
+    if parts == 1:
+        runs = [run_part(0)]
+    else:
+        with ThreadPoolExecutor(max_workers=parts) as executor:
+            runs = list(executor.map(run_part, range(parts)))
+
+    records = [record for run in runs for record in run.get("collected") or []]
+    grouped = _group_by_assert(records)
+    # asserts a crashed run never reached count as not passed
+    total = len(asserts) if any(run["status"] != "pass" for run in runs) else len(grouped)
+    report, error_type, passed, failed = _report(grouped, asserts, total)
+
+    outcome = {
+        "status": "pass",
+        "stdout": "\n".join(run.get("stdout", "") for run in runs if run.get("stdout")),
+        "exec_seconds": max(run["exec_seconds"] for run in runs),
+        "peak_memory_kb": max((run.get("peak_memory_kb") or 0 for run in runs), default=None),
+        "passed": passed,
+        "total": total,
+        "score": round(passed / total, 4) if total else 0.0,
+        "runs": runs,
+    }
+
+    crashed = next((run for run in runs if run["status"] != "pass"), None)
+    if crashed is not None:
+        # the run itself failed outside the asserts (definition error, timeout, crash...)
+        outcome.update({key: crashed[key] for key in ("status", "error_type", "error_message", "traceback")})
+        if records:
+            outcome["traceback"] = f"{report}\n\n{crashed['traceback']}"
+    elif failed:
+        outcome.update({
+            "status": "fail",
+            "error_type": error_type,
+            "error_message": f"{failed} of {total} assertions failed",
+            "traceback": report,
+            "assertions": report,
+        })
+    return outcome
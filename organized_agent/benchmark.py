@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import organized_agent.agent_helper_toolbox as toolbox
+import organized_agent.fix_index as fix_index
+import organized_agent.llm_cache as llm_cache
+import organized_agent.profiling as profiling
+import organized_agent.prompts as prompts
+from organized_agent.profiling import prompt_savings
+from organized_agent.results_writer import configure_results_writer
+from organized_agent.scheduler import configure_budget, passes_per_gpu_hour
+from organized_agent.llm_pool import LLMPool, print_endpoint_stats
+from organized_agent.graph_definition import compile_graph, make_sqlite_checkpointer
+from organized_agent.perf_check import format_perf_summary, summarize_perf
+from organized_agent.nodes.speculative_fix_node import summarize_speculation
+from organized_agent.mock_llm import MOCK_MODES, MockOpenAIClient, MockReplyEngine, start_mock_server
+from organized_agent.problem_store import get_problem_store
+from organized_agent.sandbox import get_sandbox_pool
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _node_overhead(results: list) -> dict:
+    """
+    Per node: latency percentiles (over the profile entries kept in the
+    states) and, from the per-node totals, calls, max and the mean share not
+    spent waiting for the model.
+    """
+    per_node = {}
+    totals = {}
+    for result in results:
+        for entry in result.get("profile") or []:
+            per_node.setdefault(entry["node"], []).append(entry["seconds"])
+        for node, stats in (result.get("profile_summary") or {}).items():
+            total = totals.setdefault(node, {"calls": 0, "seconds": 0.0, "llm_seconds": 0.0, "max_seconds": 0.0})
+            total["calls"] += stats["calls"]
+            total["seconds"] += stats["seconds"]
+            total["llm_seconds"] += stats.get("llm_seconds", 0.0)
+            total["max_seconds"] = max(total["max_seconds"], stats["max_seconds"])
+
+    summary = {}
+    for node, total in sorted(totals.items()):
+        seconds = per_node.get(node) or [0.0]
+        # concurrent model calls inside one node (pass@k) can exceed its wall time
+        overhead = max(0.0, total["seconds"] - total["llm_seconds"]) / total["calls"]
+        summary[node] = {
+            "calls": total["calls"],
+            "p50_s": round(_percentile(seconds, 0.5), 4),
+            "p95_s": round(_percentile(seconds, 0.95), 4),
+            "max_s": round(total["max_seconds"], 4),
+            "mean_overhead_s": round(overhead, 4),
+        }
+    return summary
+
+
+def _state_sizes(results: list) -> dict:
+    """Serialized bytes per recent step (profiling.MEASURE_STATE_SIZE), or None when not measured."""
+    entries = [entry for result in results for entry in result.get("profile") or [] if "state_bytes" in entry]
+    if not entries:
+        return None
+    state_bytes = [entry["state_bytes"] for entry in entries]
+    update_bytes = [entry["update_bytes"] for entry in entries]
+    return {
+        "steps": len(entries),
+        "state_mean_bytes": round(statistics.fmean(state_bytes)),
+        "state_max_bytes": max(state_bytes),
+        "update_mean_bytes": round(statistics.fmean(update_bytes)),
+        "final_state_mean_bytes": round(statistics.fmean(profiling.serialized_size(result) for result in results)),
+    }
+
+
+def run_benchmark(
+    mode: str = "canonical",
+    limit: int = None,
+    max_in_flight: int = 4,
+    samples_per_attempt: int = 1,
+    latency: float = 0.0,
+    token_delay: float = 0.0,
+    use_server: bool = False,
+    checkpointer: bool = False,
+    trace_memory: bool = False,
+    prompt_layout: str = prompts.PROMPT_LAYOUT,
+    fused: bool = False,
+    endpoints: int = 1,
+    fail_endpoint: bool = False,
+    measure_state: bool = False,
+    perf_check: bool = False,
+    speculative: bool = False,
+) -> dict:
+    """
+    Run the full graph over the dataset against the mock model and measure
+    the orchestration: problems/sec, per-node overhead and memory.
+    The LLM cache is bypassed and results go to a temporary directory.
+    endpoints > 1 starts that many HTTP mock servers behind an LLMPool;
+    fail_endpoint stops the first one so the run exercises failover.
+    measure_state records the serialized state size after every node.
+    perf_check adds the perf_check node (passing fixes timed against the
+    canonical solution); speculative runs the first attempt through
+    speculative_fix.
+    """
+    engine = MockReplyEngine(mode, latency=latency, token_delay=token_delay)
+    servers = []
+    pool = None
+    if use_server or endpoints > 1:
+        servers = [start_mock_server(engine) for _ in range(max(1, endpoints))]
+        pool = LLMPool([base_url for _, base_url in servers], api_key="mock")
+        if fail_endpoint:
+            servers[0][0].shutdown()
+            servers[0][0].server_close()
+        toolbox.set_client(pool)
+    else:
+        toolbox.set_client(MockOpenAIClient(engine))
+
+    prompts.PROMPT_LAYOUT = prompt_layout
+    profiling.MEASURE_STATE_SIZE = measure_state
+
+    # every call must reach the (mock) model to be measured
+    llm_cache._CACHE = llm_cache.LLMCache(mode="bypass")
+    fix_index.FIX_INDEX_ENABLED = False
+
+    workdir = tempfile.mkdtemp(prefix="humanevalfix_bench_")
+    results_writer = configure_results_writer(path=os.path.join(workdir, "results_log.jsonl"))
+
+    store = get_problem_store()
+    total = min(limit, len(store)) if limit else len(store)
+    saver = make_sqlite_checkpointer(os.path.join(workdir, "checkpoints.sqlite")) if checkpointer else None
+    app = compile_graph(checkpointer=saver, samples_per_attempt=samples_per_attempt, fused=fused,
+                        perf_check=perf_check, speculative=speculative)
+    get_sandbox_pool()
+
+    def run_one(idx):
+        state = {"run_id": "benchmark", "current_index": idx, "retries": 0, "history": []}
+        return app.invoke(state, config={"configurable": {"thread_id": f"benchmark:problem-{idx}"}})
+
+    budget = configure_budget()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        results = list(executor.map(run_one, range(total)))
+    results_writer.flush()
+    elapsed = time.perf_counter() - start
+    traced_peak_mb = None
+    if trace_memory:
+        traced_peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        tracemalloc.stop()
+
+    endpoint_stats = pool.stats() if pool is not None else None
+    if pool is not None:
+        pool.close()
+    for server, _ in servers[1 if fail_endpoint else 0:]:
+        server.shutdown()
+
+    passes = sum(1 for result in results if result.get("result") == "pass")
+    stop_reasons = {}
+    for result in results:
+        reason = result.get("stop_reason") or "unknown"
+        stop_reasons[reason] = stop_reasons.get(reason, 0) + 1
+    savings = [prompt_savings(result.get("profile_summary")) for result in results]
+    return {
+        "mode": mode,
+        "problems": total,
+        "max_in_flight": max_in_flight,
+        "samples_per_attempt": samples_per_attempt,
+        "graph_variant": "fused" if fused else "two_call",
+        "speculative_first_attempt": speculative,
+        "transport": f"http x{len(servers)}" if servers else "in-process",
+        "checkpointer": checkpointer,
+        "elapsed_s": round(elapsed, 3),
+        "problems_per_s": round(total / elapsed, 3) if elapsed else 0.0,
+        "pass_at_1": round(passes / total * 100, 2) if total else 0.0,
+        "llm_calls": engine.calls,
+        "tokens": budget.tokens,
+        "attempts": sum(result.get("retries", 0) + (result.get("result") == "pass") for result in results),
+        "stop_reasons": stop_reasons,
+        "passes_per_gpu_hour": passes_per_gpu_hour(passes, elapsed, max(1, len(servers) - (1 if fail_endpoint else 0))),
+        "prompt_layout": prompt_layout,
+        **{key: sum(problem[key] for problem in savings) for key in (savings[0] if savings else {})},
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "traced_peak_mb": traced_peak_mb,
+        "nodes": _node_overhead(results),
+        "state_sizes": _state_sizes(results),
+        "perf": summarize_perf(results) if perf_check else None,
+        "speculative": summarize_speculation(results) if speculative else None,
+        "endpoints": endpoint_stats,
+        "workdir": workdir,
+    }
+
+
+def print_variant_comparison(reports: list):
+    """Side-by-side latency, pass@1 and model usage of the graph variants."""
+    print(f"\n{'variant':<12}{'elapsed s':>11}{'problems/s':>12}{'pass@1':>9}{'LLM calls':>11}{'prefill est':>13}")
+    for report in reports:
+        print(f"{report['graph_variant']:<12}{report['elapsed_s']:>11}{report['problems_per_s']:>12}"
+              f"{report['pass_at_1']:>9.2f}{report['llm_calls']:>11}{report.get('prefill_tokens_est', 0):>13}")
+
+
+def print_report(report: dict):
+    print(f"\nBenchmark ({report['graph_variant']} graph, {report['mode']} mock, {report['transport']}, {report['problems']} problems, "
+          f"{report['max_in_flight']} in flight, {report['samples_per_attempt']} samples/attempt)")
+    print(f"Elapsed: {report['elapsed_s']}s  ->  {report['problems_per_s']} problems/s")
+    print(f"Pass@1: {report['pass_at_1']:.2f}%  LLM calls: {report['llm_calls']}  attempts: {report['attempts']}  "
+          f"passes per GPU-hour: {report['passes_per_gpu_hour']}")
+    print(f"Stop reasons: {report['stop_reasons']}")
+    if "prompt_tokens_est" in report:
+        print(f"Prompt tokens ({report['prompt_layout']}, est.): sent {report['prompt_tokens_est']}  "
+              f"prefill {report['prefill_tokens_est']}  legacy {report['legacy_prompt_tokens_est']}  "
+              f"saved {report['prompt_tokens_saved_est']}")
+    print(f"Max RSS: {report['max_rss_mb']} MB  traced peak: {report['traced_peak_mb']} MB")
+    sizes = report.get("state_sizes")
+    if sizes:
+        print(f"State per step: mean {sizes['state_mean_bytes']} B, max {sizes['state_max_bytes']} B, "
+              f"update mean {sizes['update_mean_bytes']} B, final state mean {sizes['final_state_mean_bytes']} B")
+    perf = report.get("perf")
+    if perf:
+        print(format_perf_summary(perf))
+    spec = report.get("speculative")
+    if spec:
+        print(f"Speculative first attempt: {spec['hits']}/{spec['speculated']} hits ({spec['hit_rate']}%), "
+              f"est. latency saved {spec['saved_s_total']}s total, {spec['saved_s_mean']}s per problem")
+    print(f"{'node':<20}{'calls':>7}{'p50 s':>10}{'p95 s':>10}{'max s':>10}{'overhead s':>12}")
+    for node, stats in report["nodes"].items():
+        print(f"{node:<20}{stats['calls']:>7}{stats['p50_s']:>10}{stats['p95_s']:>10}{stats['max_s']:>10}{stats['mean_overhead_s']:>12}")
+    if report.get("endpoints"):
+        print_endpoint_stats(report["endpoints"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline against a mock model (no GPU needed).")
+    parser.add_argument("--mode", choices=[m for m in MOCK_MODES if m != "script"], default="canonical")
+    parser.add_argument("--limit", type=int, help="only the first N problems")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=1, help="candidates per attempt (pass@k mode)")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock seconds per model call")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="mock seconds per streamed token")
+    parser.add_argument("--server", action="store_true", help="go through the HTTP mock server instead of in-process")
+    parser.add_argument("--endpoints", type=int, default=1, help="HTTP mock servers behind the LLM pool (implies --server)")
+    parser.add_argument("--fail-endpoint", action="store_true", help="stop one mock server to exercise endpoint failover")
+    parser.add_argument("--state-size", action="store_true", help="measure the serialized state size after every node")
+    parser.add_argument("--perf-check", action="store_true", help="time passing fixes against the canonical solution")
+    parser.add_argument("--speculative", action="store_true", help="speculative direct fix during the first analysis")
+    parser.add_argument("--checkpointer", action="store_true", help="include the SQLite checkpointer")
+    parser.add_argument("--trace-memory", action="store_true", help="measure the peak Python allocation with tracemalloc")
+    parser.add_argument("--prompt-layout", choices=prompts.PROMPT_LAYOUTS, default=prompts.PROMPT_LAYOUT)
+    parser.add_argument("--fused", action="store_true", help="single analyze_and_fix call per attempt")
+    parser.add_argument("--compare-variants", action="store_true", help="run the two-call and the fused graph and compare")
+    parser.add_argument("--output", help="write the report as JSON (for regression comparisons)")
+    args = parser.parse_args()
+
+    options = dict(
+        mode=args.mode,
+        limit=args.limit,
+        max_in_flight=args.max_in_flight,
+        samples_per_attempt=args.samples,
+        latency=args.latency,
+        token_delay=args.token_delay,
+        use_server=args.server,
+        checkpointer=args.checkpointer,
+        trace_memory=args.trace_memory,
+        prompt_layout=args.prompt_layout,
+        endpoints=args.endpoints,
+        fail_endpoint=args.fail_endpoint,
+        measure_state=args.state_size,
+        perf_check=args.perf_check,
+        speculative=args.speculative,
+    )
+    if args.compare_variants:
+        reports = [run_benchmark(**options, fused=False), run_benchmark(**options, fused=True)]
+        for report in reports:
+            print_report(report)
+        print_variant_comparison(reports)
+        report = {"variants": reports}
+    else:
+        report = run_benchmark(**options, fused=args.fused)
+        print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
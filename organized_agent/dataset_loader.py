@@ -1,26 +1,30 @@
-from datasets import load_dataset
-import json
+import argparse
+from organized_agent.problem_store import RAW_DATASET_PATH, build_index, get_problem_store
 
-print("Downloading HumanEvalPack")
-dataset = load_dataset("bigcode/humanevalpack", "python")["test"]
-dataset.to_json("data/raw/humanevalpack_python.jsonl")
+def fetch_humanevalpack(local_path: str = RAW_DATASET_PATH):
+    """One-time download of HumanEvalPack (python) from Hugging Face, then index it."""
+    from datasets import load_dataset
 
-print(f"Saved {len(dataset)} tasks to data/raw/humanevalpack_python.jsonl")
+    print("Downloading HumanEvalPack")
+    dataset = load_dataset("bigcode/humanevalpack", "python")["test"]
+    dataset.to_json(local_path)
+    print(f"Saved {len(dataset)} tasks to {local_path}")
+    build_index(local_path)
 
 def load_humanevalpack_local(subsample: int = None):
-    """Load HumanEvalPack locally if available, else download from Hugging Face."""
-    local_path = "data/raw/humanevalpack_python.jsonl"
-    try:
-        with open(local_path) as f:
-            data = [json.loads(line) for line in f]
-        print(f"Loaded {len(data)} problems from local file.")
-        if subsample:
-            data = data[:subsample]
-        return data
-    except FileNotFoundError:
-        print("Local file not found, downloading from Hugging Face")
-        dataset = load_dataset("bigcode/humanevalpack", "python")["test"]
-        dataset.to_json(local_path)
-        print(f"Saved {len(dataset)} tasks to {local_path}")
-        return dataset[:subsample] if subsample else dataset
+    """Load the local HumanEvalPack problems as a list (decodes every problem; prefer get_problem_store())."""
+    store = get_problem_store()
+    total = min(subsample, len(store)) if subsample else len(store)
+    data = [store.get(index) for index in range(total)]
+    print(f"Loaded {len(data)} problems from local file.")
+    return data
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare the local HumanEvalPack problem store.")
+    parser.add_argument("command", choices=["fetch", "index"], help="fetch: download + index, index: rebuild the offset index")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        fetch_humanevalpack()
+    else:
+        build_index(RAW_DATASET_PATH)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+from organized_agent.test_memo import candidate_hash
+
+FIX_INDEX_PATH = os.path.join("data", "processed", "fix_index.sqlite")
+
+# look up proven reasoning / fixes before calling the model; turn off for clean benchmark runs
+FIX_INDEX_ENABLED = True
+# also offer the proven fix itself as the next candidate (not only its reasoning)
+REUSE_FIXES = True
+# fall back to reasoning proven on other tasks of the same bug_type with the same signature
+MATCH_BUG_TYPE = False
+
+
+def _history(record: dict) -> list:
+    history = record.get("history") or []
+    # parquet stores nested values as JSON text
+    if isinstance(history, str):
+        try:
+            history = json.loads(history)
+        except ValueError:
+            history = []
+    return history
+
+
+def proven_signature(record: dict):
+    """
+    Error signature the passing attempt started from: that of the last failed
+    attempt before it, "" when the first attempt passed, None if unknown
+    (records logged before attempts were summarized).
+    """
+    failed = [entry for entry in _history(record) if entry.get("result") != "pass"]
+    if failed:
+        return failed[-1].get("signature") or ""
+    if not record.get("retries"):
+        return ""
+    return None
+
+
+class FixIndex:
+    """
+    (task_id, error signature) -> reasoning and fix that went on to pass,
+    built from past results logs. The whole table is loaded into memory on
+    open, so a lookup is a dict access and can run on every attempt.
+    """
+
+    def __init__(self, path: str = FIX_INDEX_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._by_task = {}
+        self._by_bug_type = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(
+                    "SELECT task_id, bug_type, signature, code_hash, reasoning, fixed_code, run_id, passes FROM fixes "
+                    "ORDER BY passes DESC, last_seen DESC"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            conn.close()
+            for task_id, bug_type, signature, code_hash, reasoning, fixed_code, run_id, passes in rows:
+                entry = {"reasoning": reasoning, "fixed_code": fixed_code, "code_hash": code_hash,
+                         "run_id": run_id, "passes": passes}
+                # rows are ordered best first, keep the first one per key
+                self._by_task.setdefault((task_id, signature), entry)
+                self._by_bug_type.setdefault((bug_type, signature), entry)
+
+    def __len__(self) -> int:
+        return len(self._by_task)
+
+    def task_count(self) -> int:
+        return len({task_id for task_id, _ in self._by_task})
+
+    def lookup(self, task_id: str, signature: str, bug_type: str = None):
+        """Proven {reasoning, fixed_code, code_hash, run_id, passes} for this failure, or None."""
+        entry = self._by_task.get((task_id, signature or ""))
+        if entry is None and MATCH_BUG_TYPE and bug_type:
+            entry = self._by_bug_type.get((bug_type, signature or ""))
+            if entry is not None:
+                # a fix for another task is useless, its reasoning may still transfer
+                entry = {**entry, "fixed_code": "", "code_hash": ""}
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+
+def build_index(sources: list, path: str = FIX_INDEX_PATH) -> int:
+    """(Re)build the index from results logs (see results_writer.merge_results sources); returns the row count."""
+    from organized_agent.results_writer import merge_results
+
+    rows = {}
+    for source in sources:
+        # every run's record of a task counts, so merge per source without a run filter
+        for record in merge_results([source]):
+            if record.get("result") != "pass" or not record.get("fixed_code"):
+                continue
+            signature = proven_signature(record)
+            if signature is None:
+                continue
+            key = (record["task_id"], signature, candidate_hash(record["fixed_code"]))
+            row = rows.get(key)
+            if row is None:
+                rows[key] = row = {
+                    "bug_type": record.get("bug_type") or "",
+                    "reasoning": record.get("reasoning") or "",
+                    "fixed_code": record["fixed_code"],
+                    "run_id": record.get("run_id"),
+                    "passes": 0,
+                    "last_seen": "",
+                }
+            row["passes"] += 1
+            if (record.get("timestamp") or "") >= row["last_seen"]:
+                row.update(reasoning=record.get("reasoning") or row["reasoning"], run_id=record.get("run_id"),
+                           last_seen=record.get("timestamp") or "")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute(
+        """CREATE TABLE fixes (
+            task_id TEXT NOT NULL,
+            bug_type TEXT,
+            signature TEXT NOT NULL,
+            code_hash TEXT NOT NULL,
+            reasoning TEXT,
+            fixed_code TEXT NOT NULL,
+            run_id TEXT,
+            passes INTEGER NOT NULL,
+            last_seen TEXT,
+            PRIMARY KEY (task_id, signature, code_hash)
+        )"""
+    )
+    conn.executemany(
+        "INSERT INTO fixes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(task_id, row["bug_type"], signature, code_hash, row["reasoning"], row["fixed_code"], row["run_id"],
+          row["passes"], row["last_seen"]) for (task_id, signature, code_hash), row in rows.items()],
+    )
+    conn.commit()
+    conn.close()
+    # readers never see a half-built index
+    os.replace(tmp_path, path)
+    print(f"Indexed {len(rows)} proven fixes from {len(sources)} sources into {path}")
+    return len(rows)
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_fix_index():
+    """The shared index, loaded on first use; None when disabled."""
+    global _INDEX
+    if not FIX_INDEX_ENABLED:
+        return None
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = FixIndex()
+        return _INDEX
+
+def lookup_proven_fix(state: dict):
+    """
+    Index entry for the state's problem and current error signature, or None.
+    An entry whose fix was already tried in this problem failed here, so it is
+    not offered again.
+    """
+    index = get_fix_index()
+    if index is None or not len(index):
+        return None
+    entry = index.lookup(state.get("problem_id", ""), state.get("error_signature", ""), state.get("bug_type"))
+    if entry is not None and entry["code_hash"] and entry["code_hash"] in (state.get("tried_candidates") or []):
+        return None
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the index of proven fixes from past results logs.")
+    parser.add_argument("command", choices=["build", "stats"])
+    parser.add_argument("sources", nargs="*", default=[os.path.join("data", "processed")],
+                        help="output directories or results files (default: data/processed)")
+    parser.add_argument("--index", default=FIX_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(args.sources, args.index)
+    else:
+        index = FixIndex(args.index)
+        print(f"{args.index}: {len(index)} (task, signature) entries over {index.task_count()} tasks")
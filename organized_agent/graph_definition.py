@@ -1,49 +1,105 @@
 import os
+import sqlite3
+from functools import partial
 from langgraph.graph import StateGraph, START, END
 from organized_agent.state_schema import State
 from organized_agent.nodes.load_problem_node import load_problem_node
 from organized_agent.nodes.analyze_bug_node import analyze_bug_node
+from organized_agent.nodes.analyze_and_fix_node import analyze_and_fix_node
 from organized_agent.nodes.generate_fix_node import generate_fix_node
 from organized_agent.nodes.run_tests_node import run_tests_node
+from organized_agent.nodes.sample_candidates_node import sample_candidates_node
+from organized_agent.nodes.perf_check_node import perf_check_node
+from organized_agent.nodes.speculative_fix_node import route_speculation, speculative_fix_node
 from organized_agent.nodes.evaluate_result_node import evaluate_result_node
 from organized_agent.nodes.log_result_node import log_result_node
+from organized_agent.profiling import timed_node
+
+CHECKPOINT_PATH = os.path.join("data", "processed", "checkpoints.sqlite")
 
 def route_result(state: State):
-    """Define and compile the LangGraph workflow for the HumanEvalFix agent."""
-    retries = state.get("retries", 0)
-    result = state.get("result", "fail")
+    """Follow the scheduler's decision made in evaluate_result (see scheduler.next_action)."""
+    action = state.get("next_action")
+    if action:
+        return action
 
-    if retries >= 5:
+    # state from a checkpoint written before the scheduler existed
+    if state.get("retries", 0) >= 5:
         print("Max retry limit reached. Logging result and moving on.")
         return "log_result"
+    return "analyze_bug" if state.get("result", "fail") == "fail" else "log_result"
 
-    if result == "fail":
-        return "analyze_bug"
 
-    return "log_result"
+def define_graph(samples_per_attempt: int = 1, fused: bool = False, perf_check: bool = False, speculative: bool = False):
+    """Construct the full LangGraph workflow.
 
+    With samples_per_attempt > 1 the generate_fix -> run_tests pair is replaced
+    by a sample_candidates node that draws and tests that many candidates per attempt.
+    With fused=True analyze_bug and generate_fix are replaced by a single
+    analyze_and_fix node (one structured model call per attempt).
+    With perf_check=True a perf_check node between the tests and
+    evaluate_result times passing fixes against the canonical solution.
+    With speculative=True the first attempt goes through speculative_fix,
+    which tests a direct fix while analyze_bug runs; a pass skips the fix step,
+    retries take the normal analyze_bug path.
+    Every node is wrapped with timed_node so its latency, tokens and test runs
+    end up in state["profile"].
+    """
+    if fused and samples_per_attempt > 1:
+        raise ValueError("The fused analyze_and_fix graph draws one candidate per attempt (samples_per_attempt=1)")
+    if fused and speculative:
+        raise ValueError("The fused analyze_and_fix graph has no separate analysis to overlap (speculative=False)")
 
-def define_graph():
-    """Construct the full LangGraph workflow."""
     graph = StateGraph(State)
 
-    graph.add_node("load_problem", load_problem_node)
-    graph.add_node("analyze_bug", analyze_bug_node)
-    graph.add_node("generate_fix", generate_fix_node)
-    graph.add_node("run_tests", run_tests_node)
-    graph.add_node("evaluate_result", evaluate_result_node)
-    graph.add_node("log_result", log_result_node)
-
+    graph.add_node("load_problem", timed_node("load_problem", load_problem_node))
+    graph.add_node("evaluate_result", timed_node("evaluate_result", evaluate_result_node))
+    graph.add_node("log_result", timed_node("log_result", log_result_node))
     graph.add_edge(START, "load_problem")
-    graph.add_edge("load_problem", "analyze_bug")
-    graph.add_edge("analyze_bug", "generate_fix")
-    graph.add_edge("generate_fix", "run_tests")
-    graph.add_edge("run_tests", "evaluate_result")
+
+    if fused:
+        graph.add_node("analyze_and_fix", timed_node("analyze_and_fix", analyze_and_fix_node))
+        graph.add_node("run_tests", timed_node("run_tests", run_tests_node))
+        graph.add_edge("load_problem", "analyze_and_fix")
+        graph.add_edge("analyze_and_fix", "run_tests")
+        tested = "run_tests"
+    elif samples_per_attempt > 1:
+        sample_node = partial(sample_candidates_node, samples=samples_per_attempt)
+        graph.add_node("analyze_bug", timed_node("analyze_bug", analyze_bug_node))
+        graph.add_node("sample_candidates", timed_node("sample_candidates", sample_node))
+        graph.add_edge("analyze_bug", "sample_candidates")
+        fix, tested = "sample_candidates", "sample_candidates"
+    else:
+        graph.add_node("analyze_bug", timed_node("analyze_bug", analyze_bug_node))
+        graph.add_node("generate_fix", timed_node("generate_fix", generate_fix_node))
+        graph.add_node("run_tests", timed_node("run_tests", run_tests_node))
+        graph.add_edge("analyze_bug", "generate_fix")
+        graph.add_edge("generate_fix", "run_tests")
+        fix, tested = "generate_fix", "run_tests"
+
+    if perf_check:
+        graph.add_node("perf_check", timed_node("perf_check", perf_check_node))
+        graph.add_edge(tested, "perf_check")
+        graph.add_edge("perf_check", "evaluate_result")
+    else:
+        graph.add_edge(tested, "evaluate_result")
+
+    if speculative:
+        graph.add_node("speculative_fix", timed_node("speculative_fix", speculative_fix_node))
+        graph.add_edge("load_problem", "speculative_fix")
+        graph.add_conditional_edges(
+            "speculative_fix",
+            route_speculation,
+            {"evaluate": "perf_check" if perf_check else "evaluate_result", "fix": fix},
+        )
+    elif not fused:
+        graph.add_edge("load_problem", "analyze_bug")
+
     graph.add_conditional_edges(
         "evaluate_result",
         route_result,
         {
-            "analyze_bug": "analyze_bug",
+            "analyze_bug": "analyze_and_fix" if fused else "analyze_bug",
             "log_result": "log_result",
         },
     )
@@ -51,10 +107,20 @@ def define_graph():
     graph.add_edge("log_result", END)
     return graph
     
-def compile_graph():
+def make_sqlite_checkpointer(path: str = CHECKPOINT_PATH):
+    """Persistent checkpointer so an interrupted problem resumes from its last completed node."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # the saver serializes access with its own lock, so the batch threads can share it
+    conn = sqlite3.connect(path, check_same_thread=False)
+    return SqliteSaver(conn)
+
+def compile_graph(checkpointer=None, samples_per_attempt: int = 1, fused: bool = False, perf_check: bool = False,
+                  speculative: bool = False):
     """Compile the graph into an executable LangGraph app."""
-    graph = define_graph()
-    return graph.compile()
+    graph = define_graph(samples_per_attempt, fused, perf_check, speculative)
+    return graph.compile(checkpointer=checkpointer)
 
 def save_graph_visualization(app):
     """Generate and save a PNG visualization of the workflow."""
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.path.join("data", "processed", "llm_cache.sqlite")
+
+# "read_write": serve hits and store new responses
+# "read_only":  serve hits, never write (e.g. a shared cache from another run)
+# "bypass":     always call the model, ignore the cache completely
+LLM_CACHE_MODE = "read_write"
+CACHE_MODES = ("read_write", "read_only", "bypass")
+
+LLM_CACHE_MAX_MB = 512
+LLM_CACHE_MAX_AGE_DAYS = 90
+EVICT_EVERY_N_WRITES = 200
+
+
+def make_cache_key(model: str, temperature: float, messages: list, sample_index: int = None, variant: str = None) -> str:
+    """
+    Content hash of everything that determines a completion. variant separates
+    responses that were post-processed differently (e.g. stopped early).
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "temperature": temperature,
+            "messages": messages,
+            "sample_index": sample_index,
+            "variant": variant,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    File-backed (SQLite) cache of model responses keyed by make_cache_key().
+    WAL journaling and a busy timeout let several threads or processes
+    read and write the same file. Entries older than max_age_days are
+    ignored and deleted; when the stored responses exceed max_mb the least
+    recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        mode: str = LLM_CACHE_MODE,
+        max_mb: float = LLM_CACHE_MAX_MB,
+        max_age_days: float = LLM_CACHE_MAX_AGE_DAYS,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        if mode == "read_write":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+            conn.commit()
+
+    def _connection(self):
+        """sqlite3 connections cannot be shared between threads, so keep one per thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.mode == "read_only":
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+            else:
+                conn = sqlite3.connect(self.path, timeout=30)
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """Return the cached response for key, or None on a miss."""
+        if self.mode == "bypass":
+            return None
+        try:
+            row = self._connection().execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # read-only cache file that does not exist (yet)
+            row = None
+
+        if row is None or time.time() - row[1] > self.max_age_seconds:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if self.mode == "read_write":
+            conn = self._connection()
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        """Store a response (only in read_write mode)."""
+        if self.mode != "read_write":
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, len(response.encode("utf-8")), now, now),
+        )
+        conn.commit()
+
+        with self._lock:
+            self._writes += 1
+            evict_now = self._writes % EVICT_EVERY_N_WRITES == 0
+        if evict_now:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_mb."""
+        if self.mode != "read_write":
+            return
+        conn = self._connection()
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            stale_keys = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+                stale_keys.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+        conn.commit()
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    """Return the shared response cache, creating it on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LLMCache()
+        return _CACHE
@@ -0,0 +1,229 @@
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import httpx
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
+
+HEALTH_CHECK_INTERVAL_SECONDS = 15
+HEALTH_CHECK_TIMEOUT_SECONDS = 3
+REQUEST_TIMEOUT_SECONDS = 600
+# consecutive failed requests before an endpoint is taken out of rotation
+FAILURES_BEFORE_EJECT = 2
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+# keep-alive connections per endpoint, shared by all threads
+MAX_CONNECTIONS_PER_ENDPOINT = 16
+
+# errors worth retrying on another endpoint; anything else (bad request...) is raised
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError, ConnectionError)
+
+
+class Endpoint:
+    """One OpenAI-compatible server, its reused client and its request statistics."""
+
+    def __init__(self, base_url: str, client):
+        self.base_url = base_url
+        self.client = client
+        self.healthy = True
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=1000)
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "in_flight": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "p50_s": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "p95_s": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_s": round(self.completion_tokens / self.busy_seconds, 1) if self.busy_seconds else None,
+        }
+
+
+class _TrackedStream:
+    """Wraps a streaming response so the endpoint is released once it is consumed or closed."""
+
+    def __init__(self, stream, finish):
+        self._stream = stream
+        self._finish = finish
+        self._tokens = 0
+        self._done = False
+
+    def __iter__(self):
+        error = None
+        try:
+            for chunk in self._stream:
+                if getattr(chunk, "choices", None) and chunk.choices[0].delta.content:
+                    self._tokens += 1
+                yield chunk
+        except RETRYABLE_ERRORS as e:
+            error = e
+            raise
+        finally:
+            self._release(error)
+
+    def close(self):
+        self._stream.close()
+        self._release(None)
+
+    def _release(self, error):
+        if not self._done:
+            self._done = True
+            self._finish(self._tokens, error)
+
+
+class LLMPool:
+    """
+    Drop-in replacement for an OpenAI client (chat.completions.create) that
+    spreads requests over several OpenAI-compatible endpoints. Each request
+    goes to the healthy endpoint with the fewest outstanding requests; failed
+    requests are retried with backoff on a different endpoint, endpoints that
+    keep failing are taken out of rotation until a background health check
+    (models.list) succeeds again. clients maps base_url -> prebuilt client
+    (e.g. in-process mocks); otherwise one OpenAI client per endpoint is
+    created with its own keep-alive connection pool.
+    """
+
+    def __init__(self, endpoints: list, api_key: str = "ollama", clients: dict = None,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+        if not endpoints:
+            raise ValueError("LLMPool needs at least one endpoint")
+        clients = clients or {}
+        self.endpoints = [Endpoint(url, clients.get(url) or self._make_client(url, api_key)) for url in endpoints]
+        self.health_check_interval = health_check_interval
+        self.max_attempts = max_attempts
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _make_client(base_url: str, api_key: str):
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS_PER_ENDPOINT, max_keepalive_connections=MAX_CONNECTIONS_PER_ENDPOINT)
+        return OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            # retries are done by the pool, on another endpoint
+            max_retries=0,
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            http_client=httpx.Client(limits=limits, timeout=REQUEST_TIMEOUT_SECONDS),
+        )
+
+    def _acquire(self, exclude: set) -> Endpoint:
+        """Least outstanding requests among healthy endpoints not tried yet for this request."""
+        with self._lock:
+            candidates = [ep for ep in self.endpoints if ep.healthy and ep not in exclude]
+            if not candidates:
+                # everything is down or tried: fall back to any endpoint not tried yet, then to all
+                candidates = [ep for ep in self.endpoints if ep not in exclude] or list(self.endpoints)
+            endpoint = min(candidates, key=lambda ep: (ep.outstanding, ep.requests))
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, seconds: float, tokens: int = 0, error: Exception = None):
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.requests += 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                endpoint.busy_seconds += seconds
+                endpoint.completion_tokens += tokens
+                endpoint.latencies.append(seconds)
+            else:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= FAILURES_BEFORE_EJECT and endpoint.healthy:
+                    endpoint.healthy = False
+                    print(f"LLM endpoint {endpoint.base_url} taken out of rotation: {type(error).__name__}: {error}")
+
+    def create(self, **kwargs):
+        """chat.completions.create on the least loaded endpoint, retried elsewhere on failure."""
+        self._ensure_health_checks()
+        tried = set()
+        for attempt in range(self.max_attempts):
+            endpoint = self._acquire(tried)
+            tried.add(endpoint)
+            start = time.perf_counter()
+            try:
+                response = endpoint.client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                self._release(endpoint, time.perf_counter() - start, error=e)
+                if attempt + 1 >= self.max_attempts:
+                    raise
+                if len(tried) >= len(self.endpoints):
+                    tried = {endpoint}
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            except Exception as e:
+                self._release(endpoint, time.perf_counter() - start, error=e)
+                raise
+
+            if kwargs.get("stream"):
+                def finish(tokens, error, endpoint=endpoint, start=start):
+                    self._release(endpoint, time.perf_counter() - start, tokens, error)
+                return _TrackedStream(response, finish)
+
+            usage = getattr(response, "usage", None)
+            self._release(endpoint, time.perf_counter() - start, getattr(usage, "completion_tokens", 0) or 0)
+            return response
+
+    def check_health(self):
+        """Probe every endpoint with models.list and update its rotation status."""
+        for endpoint in self.endpoints:
+            models = getattr(endpoint.client, "models", None)
+            if models is None:
+                continue
+            try:
+                models.list(timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+                healthy = True
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy and not endpoint.healthy:
+                    print(f"LLM endpoint {endpoint.base_url} is healthy again")
+                    endpoint.consecutive_failures = 0
+                elif not healthy and endpoint.healthy:
+                    print(f"LLM endpoint {endpoint.base_url} failed its health check")
+                endpoint.healthy = healthy
+
+    def _ensure_health_checks(self):
+        if self._health_thread is not None or len(self.endpoints) < 2 or not self.health_check_interval:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(target=self._health_loop, name="llm-health", daemon=True)
+                self._health_thread.start()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_check_interval):
+            self.check_health()
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self) -> list:
+        with self._lock:
+            return [endpoint.stats() for endpoint in self.endpoints]
+
+    def print_stats(self):
+        print_endpoint_stats(self.stats())
+
+
+def print_endpoint_stats(stats: list):
+    print(f"\n{'endpoint':<36}{'healthy':>8}{'requests':>10}{'failures':>10}{'p50 s':>8}{'p95 s':>8}{'tok/s':>8}")
+    for endpoint in stats:
+        print(f"{endpoint['base_url']:<36}{str(endpoint['healthy']):>8}{endpoint['requests']:>10}{endpoint['failures']:>10}"
+              f"{str(endpoint['p50_s']):>8}{str(endpoint['p95_s']):>8}{str(endpoint['tokens_per_s']):>8}")
@@ -1,37 +1,197 @@
-from organized_agent.graph_definition import compile_graph, save_graph_visualization
-from organized_agent.dataset_loader import load_humanevalpack_local 
+import argparse
+import os
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-def humanevalfix_batch_run():
-    """Run the LangGraph agent on the HumanEvalFix dataset and report results."""
-    DATASET = load_humanevalpack_local()
-    app = compile_graph()
-    save_graph_visualization(app)
-    total = len(DATASET)
+# the graph, model client and sandbox are imported inside the functions that
+# need them, so `merge` and `--help` start without loading them
 
-    counts = {"pass": 0, "fail": 0}
+# number of problems allowed in the graph at the same time (1 = sequential run)
+MAX_IN_FLIGHT = 4
+
+# candidates drawn and tested per attempt (> 1 enables pass@k mode)
+SAMPLES_PER_ATTEMPT = 1
+
+# one structured analyze_and_fix call per attempt instead of analyze_bug + generate_fix
+FUSED_ANALYZE_AND_FIX = False
+
+# rerunning with the same run id skips finished tasks and resumes unfinished ones
+RUN_ID = "default"
+
+# where the results log and checkpoints go (None = data/processed)
+OUTPUT_DIR = None
+
+def parse_shard(text: str):
+    """'i/n' -> (i, n) with 0 <= i < n."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got {text!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..{count - 1}, got {text!r}")
+    return index, count
+
+def shard_of(task_id: str, count: int) -> int:
+    """Stable shard of a task: the same on every machine and for every dataset order."""
+    return zlib.crc32(task_id.encode("utf-8")) % count
+
+def select_tasks(store, tasks: list = None, shard: tuple = None) -> list:
+    """
+    Dataset positions to run: those whose task_id or bug_type is listed in
+    tasks (all when empty), restricted to shard (index, count) if given.
+    """
+    wanted = set(tasks or [])
+    selected = []
+    for idx, task_id in enumerate(store.task_ids):
+        if shard is not None and shard_of(task_id, shard[1]) != shard[0]:
+            continue
+        if wanted and task_id not in wanted and store.get(idx)["bug_type"] not in wanted:
+            continue
+        selected.append(idx)
+    return selected
+
+def summarize_state(state: dict) -> str:
+    """One line per problem instead of the whole state."""
+    return (f"{state.get('problem_id')} result={state.get('result')} score={state.get('score')} "
+            f"retries={state.get('retries', 0)} stop={state.get('stop_reason') or '-'} "
+            f"error={state.get('error_type') or '-'} candidates={len(state.get('tried_candidates') or [])}")
+
+def run_single_problem(app, idx: int, total: int, run_id: str = RUN_ID):
+    """
+    Run the graph on one problem with its own fresh state and thread id.
+    Only called for tasks without a record in the results log of run_id.
+    """
+    from organized_agent.agent_helper_toolbox import log_result_to_jsonl
+    from organized_agent.scheduler import get_budget
 
-    for idx in range(total):
-        try:
+    try:
+        config = {"configurable": {"thread_id": f"{run_id}:problem-{idx}"}}
+
+        snapshot = app.get_state(config)
+        if snapshot.next:
+            # interrupted earlier: continue from the last completed node
+            print(f"Resuming problem {idx} at {snapshot.next}")
+            result = app.invoke(None, config=config)
+        elif snapshot.values:
+            # graph already finished for this thread, but its record never reached the
+            # results log (lost in the writer queue by a crash after the final checkpoint)
+            result = snapshot.values
+            if result.get("result") in ("pass", "fail"):
+                print(f"Problem {idx} finished in an earlier run without a logged result — logging it again")
+                log_result_to_jsonl(result)
+        elif get_budget().exhausted():
+            # leave it unlogged so a later run with a new budget picks it up
+            get_budget().skip()
+            return {"result": "skipped_budget", "retries": 0}
+        else:
             state = {
+                "run_id": run_id,
                 "current_index": idx,
                 "retries": 0,
-                "save_history": True,
                 "history": [],
             }
+            result = app.invoke(state, config=config)
+
+        print(f"\nFinal state: {summarize_state(result)}")
+        outcome = result.get("result", "fail")
+
+        print(f"[{idx+1}/{total}] {result.get('problem_id')} → {outcome.upper()}")
+        return {"result": outcome, "retries": result.get("retries", 0), "perf": result.get("perf"),
+                "speculative": result.get("speculative")}
+
+    except Exception as e:
+        print(f"Error on problem {idx}: {e}")
+        return None
+
+def humanevalfix_batch_run(
+    max_in_flight: int = MAX_IN_FLIGHT,
+    run_id: str = RUN_ID,
+    samples_per_attempt: int = SAMPLES_PER_ATTEMPT,
+    fused: bool = FUSED_ANALYZE_AND_FIX,
+    tasks: list = None,
+    shard: tuple = None,
+    output_dir: str = OUTPUT_DIR,
+    results_format: str = None,
+    perf_check: bool = None,
+    speculative: bool = None,
+):
+    """Run the LangGraph agent on the HumanEvalFix dataset and report results.
+
+    With max_in_flight > 1 the problems are spread over a thread pool so the
+    model server receives several requests at once; outcomes are still
+    collected in dataset order. Tasks already logged for run_id are skipped
+    and interrupted ones resume from their last checkpoint. With
+    samples_per_attempt > 1 pass@k (solved by the first attempt's k samples)
+    is reported next to pass@1. fused switches to the single-call
+    analyze_and_fix graph. The batch budget (scheduler.BUDGET_*) stops new
+    problems and further attempts once it is used up.
+
+    tasks (task ids or bug types) and shard ((index, count), see shard_of)
+    select a subset of the dataset; output_dir holds this run's results log
+    and checkpoints, so shards on different machines can be merged later.
+    perf_check (default perf_check.PERF_CHECK_ENABLED) times passing fixes
+    against the canonical solution and retries those that are far slower.
+    speculative (default speculative_fix_node.SPECULATIVE_FIRST_ATTEMPT)
+    tests a direct fix concurrently with the first analysis.
+    """
+    import organized_agent.agent_helper_toolbox as toolbox
+    from organized_agent.agent_helper_toolbox import read_logged_results
+    from organized_agent.graph_definition import compile_graph, make_sqlite_checkpointer, save_graph_visualization
+    from organized_agent.llm_pool import LLMPool
+    from organized_agent.perf_check import PERF_CHECK_ENABLED, format_perf_summary, summarize_perf
+    from organized_agent.nodes.speculative_fix_node import SPECULATIVE_FIRST_ATTEMPT, summarize_speculation
+    from organized_agent.problem_store import get_problem_store
+    from organized_agent.results_writer import RESULTS_FILE, configure_results_writer, get_results_writer
+    from organized_agent.sandbox import get_sandbox_pool
+    from organized_agent.scheduler import GPU_COUNT, configure_budget, passes_per_gpu_hour
+
+    if output_dir or results_format:
+        results_dir = output_dir or os.path.dirname(RESULTS_FILE)
+        options = {"fmt": results_format} if results_format else {}
+        configure_results_writer(path=os.path.join(results_dir, os.path.basename(RESULTS_FILE)), **options)
+    checkpointer = make_sqlite_checkpointer(os.path.join(output_dir, "checkpoints.sqlite")) if output_dir else make_sqlite_checkpointer()
+
+    budget = configure_budget()
+    store = get_problem_store()
+    perf_check = PERF_CHECK_ENABLED if perf_check is None else perf_check
+    speculative = SPECULATIVE_FIRST_ATTEMPT if speculative is None else speculative
+    app = compile_graph(checkpointer=checkpointer, samples_per_attempt=samples_per_attempt, fused=fused,
+                        perf_check=perf_check, speculative=speculative)
+    save_graph_visualization(app)
+    # fork the test workers now, before the batch threads exist
+    get_sandbox_pool()
+    total = len(store)
 
-            result = app.invoke(
-                state,
-                config={"configurable": {"thread_id": f"problem-{idx}"}}
-            )
-            print("\nFinal state:\n", result)
-            outcome = result.get("result", "fail")
-            counts[outcome] = counts.get(outcome, 0) + 1
+    counts = {"pass": 0, "fail": 0}
+
+    task_ids = store.task_ids
+    selected = select_tasks(store, tasks, shard)
+    if shard is not None or tasks:
+        print(f"Selected {len(selected)}/{total} tasks" + (f" (shard {shard[0]}/{shard[1]})" if shard else ""))
+    completed = read_logged_results(run_id)
+    completed = {task_ids[idx]: completed[task_ids[idx]] for idx in selected if task_ids[idx] in completed}
+    pending = [idx for idx in selected if task_ids[idx] not in completed]
+    if completed:
+        print(f"Run '{run_id}': skipping {len(completed)} already logged tasks")
+
+    if max_in_flight > 1:
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            futures = [executor.submit(run_single_problem, app, idx, total, run_id) for idx in pending]
+            outcomes = [future.result() for future in futures]
+    else:
+        outcomes = [run_single_problem(app, idx, total, run_id) for idx in pending]
+    get_results_writer().flush()
 
-            print(f"[{idx+1}/{total}] {result.get('problem_id')} → {outcome.upper()}")
+    passes_this_run = sum(1 for outcome in outcomes if outcome is not None and outcome["result"] == "pass")
+    outcomes += list(completed.values())
+    first_attempt_passes = 0
+    for outcome in outcomes:
+        if outcome is not None:
+            counts[outcome["result"]] = counts.get(outcome["result"], 0) + 1
+            if outcome["result"] == "pass" and not outcome.get("retries"):
+                first_attempt_passes += 1
 
-        except Exception as e:
-            print(f"Error on problem {idx}: {e}")
-    
     # Compute pass@1 metric
     total_attempted = counts["pass"] + counts["fail"]
     pass_at_1 = (counts["pass"] / total_attempted) * 100 if total_attempted > 0 else 0.0
@@ -39,5 +199,131 @@ def humanevalfix_batch_run():
     print("\nBatch run completed.")
     print("Final counts:", counts)
     print(f"Pass@1: {pass_at_1:.2f}%")
-    
-humanevalfix_batch_run()
\ No newline at end of file
+    if samples_per_attempt > 1:
+        pass_at_k = (first_attempt_passes / total_attempted) * 100 if total_attempted > 0 else 0.0
+        print(f"Pass@{samples_per_attempt} (first attempt): {pass_at_k:.2f}%")
+    if perf_check:
+        perf = summarize_perf(outcomes)
+        print(format_perf_summary(perf))
+    if speculative:
+        spec = summarize_speculation(outcomes)
+        print(f"Speculative first attempt: {spec['hits']}/{spec['speculated']} hits ({spec['hit_rate']}%), "
+              f"est. latency saved {spec['saved_s_total']}s total, {spec['saved_s_mean']}s per problem")
+    spent = budget.summary()
+    gpus = GPU_COUNT or (len(toolbox.client.endpoints) if isinstance(toolbox.client, LLMPool) else 1)
+    print(f"Budget: {spent['tokens']} tokens, {spent['llm_calls']} LLM calls, {spent['elapsed_s']}s"
+          f" — {spent['skipped_budget']} problems skipped (budget {spent['exhausted'] or 'not exhausted'})")
+    print(f"Passes per GPU-hour: {passes_per_gpu_hour(passes_this_run, spent['elapsed_s'], gpus)} ({gpus} GPU)")
+    if isinstance(toolbox.client, LLMPool):
+        toolbox.client.print_stats()
+
+def merge_shards(sources: list, output: str = None, run_id: str = None):
+    """Merge shard results logs and print pass@1 over the deduplicated tasks of each run."""
+    from organized_agent.results_writer import merge_results
+
+    try:
+        records = merge_results(sources, output, run_id)
+    except FileNotFoundError as e:
+        sys.exit(f"FAILED: {e}")
+    runs = {}
+    for record in records:
+        runs.setdefault(record.get("run_id"), []).append(record)
+
+    try:
+        from organized_agent.problem_store import get_problem_store
+
+        dataset_size = len(get_problem_store())
+    except FileNotFoundError:
+        dataset_size = None
+
+    print(f"Merged {len(records)} task results from {len(sources)} sources" + (f" into {output}" if output else ""))
+    for run, run_records in sorted(runs.items(), key=lambda item: str(item[0])):
+        passes = sum(1 for record in run_records if record["result"] == "pass")
+        coverage = f"{len(run_records)}/{dataset_size} tasks" if dataset_size else f"{len(run_records)} tasks"
+        print(f"Run '{run}': {coverage}, {passes} passed, pass@1 {passes / len(run_records) * 100:.2f}%")
+        if dataset_size and len(run_records) < dataset_size:
+            print(f"  WARNING: {dataset_size - len(run_records)} tasks have no result (missing or unfinished shard)")
+    return records
+
+def build_parser() -> argparse.ArgumentParser:
+    from organized_agent.results_writer import RESULTS_FORMATS
+
+    parser = argparse.ArgumentParser(description="Run the HumanEvalFix agent, or merge the results of sharded runs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the agent on the dataset (or a shard / subset of it)")
+    run.add_argument("--shard", type=parse_shard, help="run shard i of n (0-based, e.g. 0/4), partitioned by task id")
+    run.add_argument("--tasks", action="append", default=[],
+                     help="task ids or bug types to run (comma-separated, repeatable); default all")
+    run.add_argument("--run-id", default=RUN_ID)
+    run.add_argument("--output-dir", default=OUTPUT_DIR, help="directory for the results log and checkpoints")
+    run.add_argument("--results-format", choices=RESULTS_FORMATS)
+    run.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    run.add_argument("--samples", type=int, default=SAMPLES_PER_ATTEMPT, help="candidates per attempt (pass@k mode)")
+    run.add_argument("--fused", action="store_true", default=FUSED_ANALYZE_AND_FIX, help="single analyze_and_fix call per attempt")
+    run.add_argument("--perf-check", action="store_true", default=None,
+                     help="time passing fixes against the canonical solution and retry much slower ones")
+    run.add_argument("--speculative", action="store_true", default=None,
+                     help="test a direct fix concurrently with the first analysis and skip the analysis if it passes")
+    run.add_argument("--slowdown-threshold", type=float, help="slowdown over the canonical solution that fails a fix")
+    run.add_argument("--no-fix-index", action="store_true", help="do not reuse proven fixes from past runs (clean runs)")
+    run.add_argument("--endpoints", help="comma-separated model servers (overrides LLM_ENDPOINTS)")
+    run.add_argument("--budget-tokens", type=int, help="stop the batch after this many model tokens")
+    run.add_argument("--budget-seconds", type=float, help="stop the batch after this many seconds")
+    run.add_argument("--budget-llm-calls", type=int, help="stop the batch after this many model calls")
+
+    merge = commands.add_parser("merge", help="combine shard results into one deduplicated log")
+    merge.add_argument("sources", nargs="+", help="shard output directories or results files")
+    merge.add_argument("--output", help="write the merged records here (JSONL)")
+    merge.add_argument("--run-id", help="only merge this run")
+    return parser
+
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    # a bare invocation (or options only) keeps running the whole batch
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv = ["run", *argv]
+    args = build_parser().parse_args(argv)
+
+    if args.command == "merge":
+        merge_shards(args.sources, args.output, args.run_id)
+        return
+
+    if args.endpoints:
+        import organized_agent.agent_helper_toolbox as toolbox
+        from organized_agent.llm_pool import LLMPool
+
+        toolbox.set_client(LLMPool([url.strip() for url in args.endpoints.split(",") if url.strip()]))
+    if args.no_fix_index:
+        import organized_agent.fix_index as fix_index
+
+        fix_index.FIX_INDEX_ENABLED = False
+    if args.slowdown_threshold is not None:
+        import organized_agent.perf_check as perf_check
+
+        perf_check.SLOWDOWN_THRESHOLD = args.slowdown_threshold
+    import organized_agent.scheduler as scheduler
+
+    if args.budget_tokens is not None:
+        scheduler.BUDGET_TOKENS = args.budget_tokens
+    if args.budget_seconds is not None:
+        scheduler.BUDGET_SECONDS = args.budget_seconds
+    if args.budget_llm_calls is not None:
+        scheduler.BUDGET_LLM_CALLS = args.budget_llm_calls
+
+    tasks = [task.strip() for value in args.tasks for task in value.split(",") if task.strip()]
+    humanevalfix_batch_run(
+        max_in_flight=args.max_in_flight,
+        run_id=args.run_id,
+        samples_per_attempt=args.samples,
+        fused=args.fused,
+        tasks=tasks,
+        shard=args.shard,
+        output_dir=args.output_dir,
+        results_format=args.results_format,
+        perf_check=args.perf_check,
+        speculative=args.speculative,
+    )
+
+if __name__ == "__main__":
+    main()
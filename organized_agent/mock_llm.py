@@ -0,0 +1,264 @@
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from organized_agent.problem_store import get_problem_store
+
+MOCK_MODES = ("canonical", "buggy", "script")
+
+# prompts containing one of these ask for code, everything else gets reasoning
+FIX_PROMPT_MARKERS = ("corrected function",)
+# structured analyze_and_fix prompts, answered with {"diagnosis": ..., "code": ...}
+FUSED_PROMPT_MARKERS = ("ANALYZE_AND_FIX",)
+
+MOCK_REASONING = (
+    "1. Intended Purpose: Implement the behaviour described in the docstring.\n"
+    "2. Bug Location: The core computation of the function.\n"
+    "3. Error Explanation: The buggy expression produces a wrong value for some inputs.\n"
+    "4. Suggested Fix (in English): Restore the intended computation.\n"
+    "5. Edge Case Handling: Keep empty and boundary inputs working."
+)
+
+# text models tend to append after the code; exercises the early-stop path
+MOCK_RAMBLE = "\nThis version fixes the bug by correcting the computation.\n\nExample:\nprint(result)\n"
+
+
+class MockReplyEngine:
+    """
+    Produces replies for the agent prompts.
+    mode "canonical" answers fix prompts with the dataset canonical_solution,
+    "buggy" with the buggy_solution, and "script" with the replies listed per
+    task_id in `script` (consumed in order, the last one repeats).
+    latency is added to every call; token_delay to every streamed token.
+    """
+
+    def __init__(self, mode: str = "canonical", latency: float = 0.0, token_delay: float = 0.0,
+                 script: dict = None, ramble: bool = True):
+        if mode not in MOCK_MODES:
+            raise ValueError(f"Unknown mock mode {mode!r}, expected one of {MOCK_MODES}")
+        self.mode = mode
+        self.latency = latency
+        self.token_delay = token_delay
+        self.script = script or {}
+        self.ramble = ramble
+        self.calls = 0
+        self._script_positions = {}
+        self._lock = threading.Lock()
+        self._entry_points = None
+
+    def _problem_for(self, prompt: str):
+        """Find the problem a prompt is about from the function name it mentions."""
+        if self._entry_points is None:
+            store = get_problem_store()
+            self._entry_points = {problem["entry_point"]: index for index, problem in enumerate(store)}
+        matches = [name for name in self._entry_points if f"def {name}(" in prompt]
+        if not matches:
+            matches = [name for name in self._entry_points if re.search(rf"\b{re.escape(name)}\b", prompt)]
+        if not matches:
+            return None
+        return get_problem_store().get(self._entry_points[max(matches, key=len)])
+
+    def reply(self, messages: list) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        prompt = messages[-1]["content"]
+        fused = any(marker in prompt for marker in FUSED_PROMPT_MARKERS)
+        if not fused and not any(marker in prompt for marker in FIX_PROMPT_MARKERS):
+            return MOCK_REASONING
+
+        problem = self._problem_for(prompt)
+        if problem is None:
+            code = "def unknown():\n    pass"
+        elif self.mode == "script":
+            replies = self.script.get(problem["task_id"]) or [problem["buggy_solution"]]
+            with self._lock:
+                position = self._script_positions.get(problem["task_id"], 0)
+                self._script_positions[problem["task_id"]] = position + 1
+            code = replies[min(position, len(replies) - 1)]
+            if not fused:
+                return code
+        else:
+            body = problem["canonical_solution"] if self.mode == "canonical" else problem["buggy_solution"]
+            code = (problem["declaration"] + body).strip()
+
+        if fused:
+            return json.dumps({"diagnosis": MOCK_REASONING, "code": code})
+        return f"```python\n{code}\n```" + (MOCK_RAMBLE if self.ramble else "")
+
+    def tokens(self, text: str):
+        """Split a reply into stream chunks (words and whitespace runs)."""
+        for token in re.findall(r"\S+|\s+", text):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+
+def _usage(messages: list, completion: str):
+    prompt_tokens = sum(len(message["content"].split()) for message in messages)
+    completion_tokens = len(completion.split())
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+class _MockStream:
+    """Iterator of chat.completion.chunk-like objects with close(), like openai.Stream."""
+
+    def __init__(self, engine: MockReplyEngine, messages: list, include_usage: bool):
+        self._engine = engine
+        self._messages = messages
+        self._include_usage = include_usage
+        self.closed = False
+
+    def __iter__(self):
+        text = self._engine.reply(self._messages)
+        for token in self._engine.tokens(text):
+            if self.closed:
+                return
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))], usage=None)
+        if self._include_usage:
+            yield SimpleNamespace(choices=[], usage=_usage(self._messages, text))
+
+    def close(self):
+        self.closed = True
+
+
+class _MockCompletions:
+    def __init__(self, engine: MockReplyEngine):
+        self._engine = engine
+
+    def create(self, model: str, messages: list, temperature: float = None, stream: bool = False,
+               stream_options: dict = None, **kwargs):
+        if stream:
+            include_usage = bool((stream_options or {}).get("include_usage"))
+            return _MockStream(self._engine, messages, include_usage)
+        text = self._engine.reply(messages)
+        message = SimpleNamespace(role="assistant", content=text)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=_usage(messages, text),
+            model=model,
+        )
+
+
+class MockOpenAIClient:
+    """In-process replacement for openai.OpenAI (chat.completions.create only)."""
+
+    def __init__(self, engine: MockReplyEngine):
+        self.engine = engine
+        self.chat = SimpleNamespace(completions=_MockCompletions(engine))
+
+
+def _make_handler(engine: MockReplyEngine):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            messages = request["messages"]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            model = request.get("model", "mock")
+
+            if not request.get("stream"):
+                text = engine.reply(messages)
+                usage = _usage(messages, text)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": vars(usage),
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def send_event(payload):
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+            text = engine.reply(messages)
+            try:
+                for token in engine.tokens(text):
+                    send_event({**chunk, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                send_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    send_event({**chunk, "choices": [], "usage": vars(_usage(messages, text))})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # client hung up early (stopped or cancelled stream)
+                pass
+            self.close_connection = True
+
+    return MockHandler
+
+
+def start_mock_server(engine: MockReplyEngine, host: str = "127.0.0.1", port: int = 0):
+    """Serve the engine on a background thread; returns (server, base_url). port=0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _make_handler(engine))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a deterministic OpenAI-compatible mock model server.")
+    parser.add_argument("--mode", choices=MOCK_MODES, default="canonical")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--script", help="JSON file mapping task_id to a list of replies (mode=script)")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    engine = MockReplyEngine(args.mode, args.latency, args.token_delay, script)
+    server, base_url = start_mock_server(engine, args.host, args.port)
+    print(f"Mock model server ({args.mode}) listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
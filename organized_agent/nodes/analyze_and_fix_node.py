@@ -0,0 +1,103 @@
+from organized_agent.state_schema import MAX_REASONING_CHARS, State, clip_text
+from organized_agent.agent_helper_toolbox import get_text_response
+from organized_agent.prompts import fused_prompt
+from organized_agent.fix_index import REUSE_FIXES, lookup_proven_fix
+from organized_agent.nodes.analyze_bug_node import analyze_bug_node
+from organized_agent.nodes.generate_fix_node import generate_fix_node
+import json
+import re
+import time
+
+# keys models use for the two parts when they do not follow the requested names
+_DIAGNOSIS_KEYS = ("diagnosis", "reasoning", "analysis", "explanation")
+_CODE_KEYS = ("code", "fixed_code", "corrected_function", "function", "solution")
+
+def _json_candidates(text: str):
+    """The reply itself, fenced blocks, and the outermost {...} span, in that order."""
+    yield text
+    for block in re.findall(r"```(?:json)?\s*\n(.*?)```", text, flags=re.DOTALL):
+        yield block
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        yield text[start:end + 1]
+
+def parse_fused_response(text: str):
+    """
+    Extract (diagnosis, code) from a structured reply. Accepts JSON wrapped in
+    a fence or surrounded by prose, alternative key names and code that is
+    itself fenced. Returns None unless the code contains a top-level def.
+    """
+    payload = None
+    for candidate in _json_candidates(text.strip()):
+        try:
+            # strict=False: models sometimes put raw newlines inside JSON strings
+            payload = json.loads(candidate, strict=False)
+        except ValueError:
+            continue
+        if isinstance(payload, dict):
+            break
+        payload = None
+    if payload is None:
+        return None
+
+    diagnosis = next((payload[key] for key in _DIAGNOSIS_KEYS if isinstance(payload.get(key), str)), "")
+    code = next((payload[key] for key in _CODE_KEYS if isinstance(payload.get(key), str)), "")
+    code = code.replace("```python", "").replace("```", "").strip()
+    # a SyntaxError in the code is still a usable answer, run_tests reports it as feedback
+    if not re.search(r"^def \w+\s*\(", code, flags=re.MULTILINE):
+        return None
+    return diagnosis, code
+
+def analyze_and_fix_node(state: State):
+    """
+    Diagnose the failure and produce the corrected function in a single model
+    call with a JSON reply. Falls back to analyze_bug + generate_fix when the
+    reply cannot be parsed.
+    """
+    print("Analyzing bug and generating fix (single call)...")
+
+    last_error = state.get("last_error", {}) or {}
+    update = {"graph_variant": "fused", "error_type": last_error.get("type", "UnknownError")}
+    entry_point = state.get("entry_point", "")
+
+    duplicate_note = ""
+    if state.get("duplicate_candidate"):
+        duplicate_note = (
+            "IMPORTANT: The last failed version is identical to a fix that was already tried for this task. "
+            "Propose a materially different approach and do NOT return the same code again."
+        )
+
+    # the same failure of this task was already diagnosed and fixed in a past run
+    proven = lookup_proven_fix(state)
+    if proven is not None and REUSE_FIXES and proven["fixed_code"]:
+        print(f"Reusing proven reasoning and fix from the fix index (run {proven['run_id']})")
+        update.update(reasoning=proven["reasoning"], reasoning_source="fix_index", fixed_code=proven["fixed_code"],
+                      generation_stats={"fused": True, "source": "fix_index"})
+        return update
+
+    system_prompt, prompt = fused_prompt({**state, **update}, duplicate_note)
+    start = time.perf_counter()
+    reply = get_text_response(prompt, system_prompt=system_prompt, json_mode=True)
+    elapsed = time.perf_counter() - start
+
+    parsed = parse_fused_response(reply)
+    if parsed is None:
+        print("FAILED: could not parse the structured reply, falling back to separate analysis and fix calls")
+        update.update(analyze_bug_node(state))
+        update.update(generate_fix_node({**state, **update}))
+        update["generation_stats"] = {**(update.get("generation_stats") or {}), "fused": True, "fused_parsed": False}
+        return update
+
+    reasoning, fixed_code = parsed
+    #  ensuring correct function name, as generate_fix does
+    if not re.search(rf"^def {re.escape(entry_point)}\(", fixed_code, flags=re.MULTILINE):
+        fixed_code = re.sub(r"def\s+\w+\s*\(", f"def {entry_point}(", fixed_code, count=1)
+
+    update["reasoning"] = clip_text(reasoning, MAX_REASONING_CHARS)
+    update["reasoning_source"] = "model"
+    update["fixed_code"] = fixed_code
+    update["generation_stats"] = {"fused": True, "fused_parsed": True, "total_s": elapsed}
+
+    print("Reasoning:\n", reasoning)
+    print("Generated Fix:\n", fixed_code)
+    return update
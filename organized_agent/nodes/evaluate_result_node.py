@@ -1,19 +1,36 @@
-from organized_agent.state_schema import State
+from organized_agent.state_schema import State, push_history
+from organized_agent.scheduler import next_action
 
 def evaluate_result_node(state: State):
-    
+
     print("Evaluating test result...")
     result = state.get("result", "unknown")
     retries = state.get("retries", 0)
 
+    # compact attempt summary; the scheduler decides on these signals
+    attempt = {
+        "attempt": retries,
+        "result": result,
+        "score": state.get("score") or 0.0,
+        "error_type": state.get("error_type", ""),
+        "signature": state.get("error_signature", ""),
+        "candidate_hash": state.get("candidate_hash", ""),
+        "duplicate": bool(state.get("duplicate_candidate")),
+    }
+    update = {"history": push_history(state.get("history"), attempt)}
+
     if result == "pass":
         print(f"SUCCESS! All tests passed for {state.get('problem_id', 'unknown')}")
-        state["next_action"] = "log_result"
-
     else:
         retries += 1
+        update["retries"] = retries
+
+    action, stop_reason = next_action({**state, **update})
+    update["next_action"] = action
+    update["stop_reason"] = stop_reason
+    if action == "analyze_bug":
         print(f"FAILED attempt #{retries} — retrying...")
-        state["retries"] = retries
-        state["next_action"] = "analyze_bug"
+    elif result != "pass":
+        print(f"FAILED attempt #{retries} — stopping ({stop_reason})")
 
-    return state
\ No newline at end of file
+    return update
@@ -1,48 +1,118 @@
 from organized_agent.state_schema import State
-from organized_agent.agent_helper_toolbox import get_text_response
+from organized_agent.agent_helper_toolbox import get_text_response, stream_text_response
+from organized_agent.prompts import fix_prompt
+from organized_agent.fix_index import REUSE_FIXES, lookup_proven_fix
+import ast
 import re
+import threading
 
-def generate_fix_node(state: State):
-    print("Generating candidate fix...")
+# stream the fix and stop decoding once the function is complete
+STREAM_GENERATION = True
 
-    buggy_code = state.get("buggy_code", "")
-    reasoning = state.get("reasoning", "")
-    description_of_question = state.get("human_question", "")
-    entry_point = state.get("entry_point", "")
-    docstring_description = state.get("docstring_description", "")
+# top-level lines that can still belong to the solution (helpers, imports, decorators)
+_SOLUTION_LINE_PREFIXES = ("#", "@", "def ", "async def ", "class ", "import ", "from ")
 
-    prompt = f"""
-    You are a Python expert. Your task is to fix a buggy function so that it passes all its unit tests.
+# running totals of streams that were not cut, used to estimate tokens saved
+_full_stream_totals = {"count": 0, "tokens": 0}
+_full_stream_lock = threading.Lock()
 
-    ### Problem description
-    {description_of_question or docstring_description}
+def extract_complete_function(text: str, entry_point: str):
+    """
+    Return the solution code once a complete top-level `def {entry_point}(`
+    has been emitted, i.e. it parses and is followed by a closing fence or by
+    an unindented line that is not part of the solution (prose, test calls...).
+    Returns None while the function may still be incomplete.
+    """
+    # the last line may still be growing
+    lines = text.split("\n")[:-1]
 
-    ### Buggy function
-    {buggy_code}
+    start = 0
+    def_idx = None
+    for i, line in enumerate(lines):
+        if line.strip().startswith("```") and def_idx is None:
+            start = i + 1
+        elif line.startswith(f"def {entry_point}("):
+            def_idx = i
+            break
+    if def_idx is None:
+        return None
 
-    ### Your previous reasoning
-    {reasoning}
+    # without a fence, keep imports/helpers directly above the def
+    if start == 0:
+        start = def_idx
+        while start > 0 and (not lines[start - 1].strip() or lines[start - 1].startswith(_SOLUTION_LINE_PREFIXES)):
+            start -= 1
+
+    for j in range(def_idx + 1, len(lines)):
+        line = lines[j]
+        if not line.strip() or line[0] in " \t":
+            continue
+        if not line.startswith("```") and line.startswith(_SOLUTION_LINE_PREFIXES):
+            continue
+
+        code = "\n".join(lines[start:j]).strip()
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            # e.g. the closing line of a multi-line signature
+            continue
+        if any(isinstance(node, ast.FunctionDef) and node.name == entry_point for node in tree.body):
+            return code
+    return None
+
+def _generate_streaming(prompt: str, entry_point: str, sample_index: int = None, cancel=None, system_prompt: str = None):
+    """Stream the fix with early stop and attach timing / token stats."""
+    text, stats = stream_text_response(
+        prompt,
+        should_stop=lambda partial: extract_complete_function(partial, entry_point),
+        stop_rule="complete_function",
+        sample_index=sample_index,
+        cancel=cancel,
+        system_prompt=system_prompt,
+    )
+    if stats["cancelled"]:
+        return text, stats
 
-    ### Critical requirements:
-    1. The function **must keep the exact same name and parameters** as the original:
-    - It must start exactly with: def {entry_point}(
-    2. The goal of the function is to satisfy the described behavior above.
-    3. Do **not** rename variables, remove parameters, or change the return type unless needed for correctness.
-    4. Use only the Python standard library (no external imports).
-    5. The corrected version must be **logically complete and pass all provided tests**.
-    6. Handle edge cases safely (empty lists, zero division, invalid inputs, etc.).
-    7. Return **only valid Python code** — no Markdown, explanations, or comments.
-    8. Keep the exact same function signature: do not add or remove parameters.
-    9. Ensure that variable types match the expected behavior (e.g., do not mix strings and numbers).
-    10. Return values of the correct type as implied by the task description and tests.
+    with _full_stream_lock:
+        if not stats["cached"] and not stats["stopped_early"]:
+            _full_stream_totals["count"] += 1
+            _full_stream_totals["tokens"] += stats["tokens_streamed"]
+        full_count, full_tokens = _full_stream_totals["count"], _full_stream_totals["tokens"]
 
+    # conservative: streams that ran to completion are the ones without a long tail
+    stats["tokens_saved_est"] = None
+    if stats["stopped_early"] and full_count:
+        stats["tokens_saved_est"] = max(0, round(full_tokens / full_count - stats["tokens_streamed"]))
 
-    Make sure the function behaves correctly for typical and edge-case inputs implied by the description (e.g., positive, negative, zero, decimal values).
-    ### Now output ONLY the corrected function below:
+    if stats["cached"]:
+        print("Fix served from the LLM cache")
+    else:
+        print(
+            f"TTFT: {stats['ttft_s'] or 0.0:.3f}s, streamed {stats['tokens_streamed']} tokens, "
+            f"stopped early: {stats['stopped_early']}, est. tokens saved: {stats['tokens_saved_est']}"
+        )
+    return text, stats
 
+def generate_candidate(state: State, sample_index: int = None, cancel=None):
     """
+    Ask the model for one corrected version of the function.
+    Returns (cleaned_code, generation_stats); stats is None on the non-streaming path.
+    sample_index draws distinct samples of the same prompt, cancel (a threading.Event)
+    abandons a streaming generation that is no longer needed.
+    """
+    entry_point = state.get("entry_point", "")
+
+    duplicate_note = ""
+    if state.get("duplicate_candidate"):
+        duplicate_note = "You already tried this exact fix and it failed. Do NOT return the same code again."
 
-    fixed_code = get_text_response(prompt)
+    system_prompt, prompt = fix_prompt(state, duplicate_note)
+
+    stats = None
+    if STREAM_GENERATION:
+        fixed_code, stats = _generate_streaming(prompt, entry_point, sample_index, cancel, system_prompt)
+    else:
+        fixed_code = get_text_response(prompt, sample_index=sample_index, system_prompt=system_prompt)
 
     cleaned_code = (
         fixed_code.replace("```python", "")
@@ -55,7 +125,22 @@ def generate_fix_node(state: State):
     if not cleaned_code.strip().startswith(f"def {entry_point}("):
         cleaned_code = re.sub(r"def\s+\w+\s*\(", f"def {entry_point}(", cleaned_code)
 
-    state["fixed_code"] = cleaned_code
+    return cleaned_code, stats
+
+def generate_fix_node(state: State):
+    print("Generating candidate fix...")
+
+    # independent of where the reasoning came from: entries without reasoning still carry a fix
+    if REUSE_FIXES:
+        proven = lookup_proven_fix(state)
+        if proven is not None and proven["fixed_code"]:
+            print("Reusing proven fix from the fix index:\n", proven["fixed_code"])
+            return {"fixed_code": proven["fixed_code"], "generation_stats": {"source": "fix_index"}}
+
+    fixed_code, stats = generate_candidate(state)
+    update = {"fixed_code": fixed_code}
+    if stats is not None:
+        update["generation_stats"] = stats
 
-    print("Generated Fix:\n", state["fixed_code"])
-    return state
\ No newline at end of file
+    print("Generated Fix:\n", fixed_code)
+    return update
\ No newline at end of file
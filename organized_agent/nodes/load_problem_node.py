@@ -1,29 +1,34 @@
 from organized_agent.state_schema import State
-from organized_agent.dataset_loader import load_humanevalpack_local
+from organized_agent.problem_store import get_problem_store
 
-
-DATASET = load_humanevalpack_local()
 def load_problem_node(state: State):
-    """Load the current problem into the agent state."""
+    """Load the current problem's identity into the agent state (the problem data stays in the store)."""
     print(f"Loading problem {state.get('current_index', 0)}")
 
+    index = state.get("current_index", 0)
+    problem = get_problem_store().get(index)
+
     # reseting fields before loading new data, because we don't want to pass reasoning from another problem
-    for key in ["reasoning", "error_hint", "result", "test_output", "last_error", "error_message"]:
-        state[key] = ""
-    state["retries"] = 0
+    update = {key: "" for key in ["reasoning", "reasoning_source", "error_hint", "result", "test_output", "error_type", "error_message"]}
+    update.update({
+        "last_error": {},
+        "retries": 0,
+        "candidate_hash": "",
+        "tried_candidates": [],
+        "duplicate_candidate": False,
+        "samples_tested": 0,
+        "perf": {},
+        "speculative": {},
+        "score": 0.0,
+        "error_signature": "",
+        "history": [],
+        "stop_reason": "",
+        "next_action": "",
+        "problem_id": problem["task_id"],
+        "entry_point": problem["entry_point"],
+        "bug_type": problem["bug_type"],
+        "fixed_code": "",
+    })
 
-    index = state.get("current_index", 0)  
-    problem = DATASET[index]
-    state["problem_id"] = problem["task_id"]
-    state["docstring_description"] = problem["docstring"]
-    state["buggy_code"] = problem["buggy_solution"]
-    state["fixed_code"] = "" 
-    state["test_code"] = problem["test"]
-    state["entry_point"] = problem["entry_point"]
-    state["expected_solution"] = problem["canonical_solution"]
-    state["human_question"] = problem["instruction"]
-    state["bug_type"] =  problem["bug_type"]
-    state["failure_symptoms"] = problem["failure_symptoms"]
-    
-    print(f"Loaded Problem: {state['problem_id']} - {state['entry_point']}")
-    return state
\ No newline at end of file
+    print(f"Loaded Problem: {update['problem_id']} - {update['entry_point']}")
+    return update
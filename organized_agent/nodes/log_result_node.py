@@ -7,4 +7,4 @@ def log_result_node(state):
     print(f"Task {state['problem_id']} completed with result: {state['result']}")
     log_result_to_jsonl(state)
 
-    return state
\ No newline at end of file
+    return {}
\ No newline at end of file
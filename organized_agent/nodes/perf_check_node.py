@@ -0,0 +1,43 @@
+from organized_agent.state_schema import MAX_TEST_OUTPUT_CHARS, State, clip_text
+from organized_agent.agent_helper_toolbox import extract_error_hint
+from organized_agent.perf_check import PERF_RECORD_ONLY, compare_to_canonical
+from organized_agent.scheduler import error_signature
+import re
+
+def _format_perf(perf: dict) -> str:
+    if perf["slowdown"] is None:
+        return perf.get("error", "not measured")
+    return (f"{perf['slowdown']:.1f}x the canonical runtime "
+            f"({perf['candidate_seconds'] * 1000:.3f} ms vs {perf['canonical_seconds'] * 1000:.3f} ms per suite), "
+            f"peak memory {perf['candidate_peak_kb']:.1f} kB vs {perf['canonical_peak_kb']:.1f} kB")
+
+def perf_check_node(state: State):
+    """Time a passing fix against the canonical solution; a much slower fix goes back to the retry loop."""
+
+    if state.get("result") != "pass":
+        return {"perf": {}}
+
+    print(f"Checking performance for {state.get('problem_id', 'unknown')}")
+    entry_point = state.get("entry_point", "unknown_function")
+    fixed_code = re.sub(r"def\s+\w+\s*\(", f"def {entry_point}(", state.get("fixed_code", ""))
+
+    perf = compare_to_canonical(state, fixed_code)
+    summary = _format_perf(perf)
+    print(f"Performance: {summary}")
+    update = {"perf": perf}
+    if not perf["slow"] or PERF_RECORD_ONLY:
+        return update
+
+    # correct but too slow: report it like any other failure so the next attempt sees why
+    message = f"The fix passes the tests but runs at {summary}; the limit is {perf['threshold']:g}x."
+    update.update({
+        "result": "fail",
+        "error_type": "PerformanceError",
+        "error_message": message,
+        "error_hint": extract_error_hint("", "PerformanceError"),
+        "error_signature": error_signature("PerformanceError", "slower than the canonical solution"),
+        "last_error": {"type": "PerformanceError", "message": message, "traceback": ""},
+        "test_output": clip_text(f"{state.get('test_output', '')}\nPerformanceError: {message}", MAX_TEST_OUTPUT_CHARS),
+    })
+    print(f"Failed: {entry_point} — PerformanceError")
+    return update
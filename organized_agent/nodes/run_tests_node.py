@@ -1,97 +1,174 @@
-from organized_agent.state_schema import State
+from organized_agent.state_schema import MAX_TEST_OUTPUT_CHARS, MAX_TRACEBACK_CHARS, State, clip_text
+from organized_agent.problem_store import problem_field
 from organized_agent.agent_helper_toolbox import extract_error_hint
+from organized_agent.sandbox import get_sandbox_pool
+from organized_agent.test_memo import TEST_MEMO, candidate_hash, memo_key
+from organized_agent.profiling import record_preflight, record_test_run
+from organized_agent.preflight import preflight_check
+from organized_agent.assertion_harness import run_assertions
+from organized_agent.scheduler import error_signature
 import re
-import io
-import contextlib
+import time
 import traceback
 
+# static checks (signature, imports, undefined names, return paths) before the sandbox
+PREFLIGHT_ENABLED = True
+
+# evaluate every assert on its own and report all failing cases (falls back to a plain run)
+PER_ASSERTION_TESTS = True
+
+def record_test_failure(state: dict, error_type: str, error_message: str, error_trace: str, output_text: str = "",
+                        entry_point: str = None):
+    """Store a failed run in the given state (or node update) using the last_error / test_output shape."""
+
+    # getting failed assertion line if no message exists
+    if error_type == "AssertionError" and not error_message:
+        tb_lines = error_trace.splitlines()
+        failed_line = ""
+        for line in reversed(tb_lines):
+            if line.strip().startswith("assert "):
+                failed_line = line.strip()
+                break
+        if failed_line:
+            error_message = f"Failed assertion: {failed_line}"
+
+    error_trace = clip_text(error_trace, MAX_TRACEBACK_CHARS)
+    state["result"] = "fail"
+    state["test_output"] = clip_text(output_text + "\n" + error_trace, MAX_TEST_OUTPUT_CHARS)
+    state["last_error"] = {
+        "type": error_type,
+        "message": error_message,
+        "traceback": error_trace,
+    }
+    state["error_type"] = error_type
+    state["error_message"] = error_message
+    state["error_signature"] = error_signature(error_type, error_message)
+
+    # generating hint
+    error_hint = extract_error_hint(error_trace, error_type)
+    if "positional argument" in error_message or "signature mismatch" in error_message:
+        error_hint = "Function signature mismatch — ensure correct parameters and name."
+    state["error_hint"] = error_hint
+
+    print(f"Failed: {entry_point or state.get('entry_point', 'unknown_function')} — {error_type}")
+    print(f"Hint: {error_hint}\nTRACEBACK:\n{error_trace}")
+    return state
+
 def run_tests_node(state: State):
-    
+
     print(f"Running tests for {state.get('problem_id', 'unknown')}")
 
-    state["test_output"] = ""
-    state["last_error"] = {}
-    state["error_type"] = ""
-    state["error_message"] = ""
+    update = {
+        "test_output": "",
+        "last_error": {},
+        "error_type": "",
+        "error_message": "",
+        "error_hint": "",
+        "error_signature": "",
+        "score": 0.0,
+    }
 
     fixed_code = state.get("fixed_code", "")
-    test_code = state.get("test_code", "")
+    test_code = problem_field(state, "test_code")
     entry_point = state.get("entry_point", "unknown_function")
 
     # correct the function name
     fixed_code = re.sub(r"def\s+\w+\s*\(", f"def {entry_point}(", fixed_code)
 
+    # flag candidates that were already tried for this problem
+    cand_hash = candidate_hash(fixed_code)
+    tried = list(state.get("tried_candidates") or [])
+    update["candidate_hash"] = cand_hash
+    update["duplicate_candidate"] = cand_hash in tried
+    if not update["duplicate_candidate"]:
+        tried.append(cand_hash)
+    update["tried_candidates"] = tried
+
+    # identical candidate + tests were already executed: reuse the outcome
+    key = memo_key(cand_hash, test_code)
+    memoized = TEST_MEMO.get(key)
+    if memoized is not None:
+        update.update(memoized)
+        record_test_run(0.0, memoized=True)
+        print(f"Reusing memoized test result for {entry_point}: {update['result']}")
+        return update
+
     # syntax validation before running
     try:
         compile(fixed_code, "<string>", "exec")
     except SyntaxError as e:
-        state["result"] = "fail"
-        state["error_type"] = "SyntaxError"
-        state["error_message"] = str(e)
-        state["error_hint"] = "SyntaxError: Invalid syntax or indentation."
-        state["last_error"] = {
+        update["result"] = "fail"
+        update["error_type"] = "SyntaxError"
+        update["error_message"] = str(e)
+        update["error_hint"] = "SyntaxError: Invalid syntax or indentation."
+        update["error_signature"] = error_signature("SyntaxError", e.msg)
+        update["last_error"] = {
             "type": "SyntaxError",
             "message": str(e),
-            "traceback": traceback.format_exc(),
+            "traceback": clip_text(traceback.format_exc(), MAX_TRACEBACK_CHARS),
         }
-        state["test_output"] = f"SyntaxError before execution: {e}"
-        return state
-
-    # combining corrected code + dataset tests
-    full_code = f"{fixed_code}\n\n{test_code}"
-
-    # execute in sandbox and capture output
-    namespace = {}
-    output_buffer = io.StringIO()
-
-    try:
-        with contextlib.redirect_stdout(output_buffer):
-            exec(full_code, namespace)
-
-        output_text = output_buffer.getvalue().strip()
-        state["test_output"] = output_text or "SUCCESS: All tests executed successfully."
-        state["result"] = "pass"
-
-        # elear errors (in case of retry success)
-        state["last_error"] = {}
-        state["error_type"] = ""
-        state["error_message"] = ""
+        update["test_output"] = f"SyntaxError before execution: {e}"
+        TEST_MEMO.put(key, update)
+        return update
+
+    # reject obviously broken candidates without a sandbox round trip
+    advisory = None
+    if PREFLIGHT_ENABLED:
+        start = time.perf_counter()
+        diagnostic = preflight_check(
+            fixed_code,
+            entry_point,
+            problem_field(state, "declaration"),
+            problem_field(state, "buggy_code"),
+            test_code,
+        )
+        if diagnostic is not None and diagnostic.get("advisory"):
+            # may be wrong about passing code: run the tests, keep it for the hint
+            advisory, diagnostic = diagnostic, None
+        record_preflight(time.perf_counter() - start, rejected=diagnostic is not None)
+        if diagnostic is not None:
+            record_test_failure(update, diagnostic["type"], diagnostic["message"], diagnostic["traceback"],
+                                entry_point=entry_point)
+            update["test_output"] = f"{diagnostic['type']} before execution: {diagnostic['message']}"
+            TEST_MEMO.put(key, update)
+            return update
+
+    # execute in isolated worker processes (timeout + rlimits) and capture output
+    pool = get_sandbox_pool()
+    outcome = run_assertions(pool, fixed_code, test_code) if PER_ASSERTION_TESTS else None
+    if outcome is None:
+        # combining corrected code + dataset tests
+        full_code = f"{fixed_code}\n\n{test_code}"
+        outcome = pool.run(full_code)
+        outcome["score"] = 1.0 if outcome["status"] == "pass" else 0.0
+    for run in outcome.get("runs") or [outcome]:
+        record_test_run(run["exec_seconds"], run.get("peak_memory_kb"))
+    output_text = outcome.get("stdout", "").strip()
+    update["score"] = outcome["score"]
+    if "total" in outcome:
+        print(f"Assertions passed: {outcome['passed']}/{outcome['total']}")
+
+    if outcome["status"] == "pass":
+        update["test_output"] = clip_text(output_text, MAX_TEST_OUTPUT_CHARS) or "SUCCESS: All tests executed successfully."
+        update["result"] = "pass"
         print(f"All tests passed for {entry_point}")
-
-    except Exception as e:
-
-        error_trace = traceback.format_exc()
-        error_type = type(e).__name__
-        error_message = str(e)
-
-        # getting failed assertion line if no message exists
-        if error_type == "AssertionError" and not error_message:
-            tb_lines = error_trace.splitlines()
-            failed_line = ""
-            for line in reversed(tb_lines):
-                if line.strip().startswith("assert "):
-                    failed_line = line.strip()
-                    break
-            if failed_line:
-                error_message = f"Failed assertion: {failed_line}"
-
-        state["result"] = "fail"
-        state["test_output"] = output_buffer.getvalue().strip() + "\n" + error_trace
-        state["last_error"] = {
-            "type": error_type,
-            "message": error_message,
-            "traceback": error_trace,
-        }
-        state["error_type"] = error_type
-        state["error_message"] = error_message
-        
-        # generating hint
-        error_hint = extract_error_hint(error_trace, error_type)
-        if "positional argument" in error_message:
-            error_hint = "Function signature mismatch — ensure correct parameters and name."
-        state["error_hint"] = error_hint
-
-        print(f"Failed: {entry_point} — {error_type}")
-        print(f"Hint: {error_hint}\nTRACEBACK:\n{error_trace}")
-
-    return state
\ No newline at end of file
+    else:
+        record_test_failure(
+            update,
+            outcome["error_type"],
+            outcome["error_message"],
+            outcome["traceback"],
+            output_text,
+            entry_point=entry_point,
+        )
+        if outcome.get("assertions"):
+            update["last_error"]["assertions"] = outcome["assertions"]
+            update["error_signature"] = error_signature(outcome["error_type"], "", outcome["assertions"])
+        if advisory is not None:
+            # reaches the fix prompt through the feedback block's Hint line
+            update["error_hint"] = f"{update['error_hint']} Also: {advisory['message']}."
+
+    # a crashed worker says nothing about the candidate itself, so allow a rerun
+    if update.get("error_type") != "SandboxCrash":
+        TEST_MEMO.put(key, update)
+    return update
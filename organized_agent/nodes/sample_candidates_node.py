@@ -0,0 +1,88 @@
+from organized_agent.state_schema import State
+from organized_agent.nodes.generate_fix_node import generate_candidate
+from organized_agent.nodes.run_tests_node import run_tests_node
+from organized_agent.test_memo import TEST_RESULT_FIELDS
+from organized_agent.profiling import submit_in_context
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+
+SAMPLES_PER_ATTEMPT = 4
+
+# lower is better: failures that at least ran the tests carry the most useful feedback
+_FAILURE_RANK = {
+    "AssertionError": 0,
+    "TimeoutError": 2,
+    "MemoryError": 2,
+    "SandboxCrash": 2,
+    "SyntaxError": 3,
+}
+
+# fields copied from the chosen candidate back into the graph state
+_CANDIDATE_FIELDS = TEST_RESULT_FIELDS + ("fixed_code", "candidate_hash", "duplicate_candidate", "generation_stats")
+
+def _generate_and_test(state: State, sample_index: int, cancel: threading.Event):
+    """Draw one candidate and run the tests on it, working on a private copy of the state."""
+    candidate = dict(state)
+    code, stats = generate_candidate(candidate, sample_index=sample_index, cancel=cancel)
+    if cancel.is_set():
+        return None
+    candidate["fixed_code"] = code
+    if stats is not None:
+        candidate["generation_stats"] = stats
+    candidate.update(run_tests_node(candidate))
+    return candidate
+
+def _failure_rank(candidate: dict):
+    # among equally informative failures prefer the one passing more assertions
+    return _FAILURE_RANK.get(candidate.get("error_type"), 1), -(candidate.get("score") or 0.0)
+
+def sample_candidates_node(state: State, samples: int = SAMPLES_PER_ATTEMPT):
+    """
+    pass@k attempt: draw `samples` candidates concurrently and test each one as
+    soon as it arrives. The first passing candidate wins and the remaining
+    generations are cancelled; if all fail, the most informative failure is
+    kept so analyze_bug receives its feedback.
+    """
+    print(f"Sampling {samples} candidate fixes...")
+
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=samples)
+    futures = [submit_in_context(executor, _generate_and_test, state, index, cancel) for index in range(samples)]
+
+    winner = None
+    failures = []
+    errors = []
+    try:
+        for future in as_completed(futures):
+            try:
+                candidate = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            if candidate is None:
+                continue
+            if candidate.get("result") == "pass":
+                winner = candidate
+                break
+            failures.append(candidate)
+    finally:
+        cancel.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if winner is None and not failures:
+        raise errors[0] if errors else RuntimeError("No candidate was generated")
+
+    chosen = winner or min(failures, key=_failure_rank)
+    update = {field: chosen[field] for field in _CANDIDATE_FIELDS if field in chosen}
+
+    # every tested candidate counts as tried for duplicate detection
+    tried = list(state.get("tried_candidates") or [])
+    for candidate in failures + ([winner] if winner else []):
+        if candidate["candidate_hash"] not in tried:
+            tried.append(candidate["candidate_hash"])
+    update["tried_candidates"] = tried
+    update["samples_tested"] = state.get("samples_tested", 0) + len(failures) + (1 if winner else 0)
+
+    print(f"Tested {len(failures) + (1 if winner else 0)}/{samples} candidates — {update['result'].upper()}")
+    print("Chosen Fix:\n", update["fixed_code"])
+    return update
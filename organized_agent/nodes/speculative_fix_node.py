@@ -0,0 +1,163 @@
+from organized_agent.state_schema import MAX_REASONING_CHARS, State, clip_text
+from organized_agent.agent_helper_toolbox import stream_text_response
+from organized_agent.prompts import analyze_prompt
+from organized_agent.fix_index import REUSE_FIXES, lookup_proven_fix
+from organized_agent.nodes.analyze_bug_node import analyze_bug_node
+from organized_agent.nodes.generate_fix_node import generate_candidate
+from organized_agent.nodes.run_tests_node import run_tests_node
+from organized_agent.test_memo import TEST_RESULT_FIELDS
+from organized_agent.profiling import submit_in_context
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+# first attempt: draw a direct fix while analyze_bug runs, and skip the analysis if that fix passes
+SPECULATIVE_FIRST_ATTEMPT = False
+
+# fields copied from a passing speculative candidate back into the graph state
+_CANDIDATE_FIELDS = TEST_RESULT_FIELDS + ("fixed_code", "candidate_hash", "duplicate_candidate", "generation_stats")
+
+# running totals of analyses that completed, used to estimate the latency a hit saves
+_analysis_totals = {"count": 0, "seconds": 0.0}
+_analysis_lock = threading.Lock()
+
+def _analyze(state: State, cancel: threading.Event):
+    """The first-attempt analysis as a cancellable stream; None once cancelled."""
+    system_prompt, prompt = analyze_prompt({**state, "error_type": "UnknownError"})
+    start = time.perf_counter()
+    text, stats = stream_text_response(prompt, system_prompt=system_prompt, cancel=cancel)
+    seconds = time.perf_counter() - start
+    if stats["cancelled"]:
+        return None
+    if not stats["cached"]:
+        with _analysis_lock:
+            _analysis_totals["count"] += 1
+            _analysis_totals["seconds"] += seconds
+    return clip_text(text.strip(), MAX_REASONING_CHARS), seconds
+
+def _speculate(state: State, proven_code: str = ""):
+    """
+    Direct fix from the buggy function and instruction alone (or the proven
+    fix from the fix index, without a model call), tested on a private copy
+    of the state.
+    """
+    candidate = dict(state)
+    if proven_code:
+        code, stats = proven_code, {"source": "fix_index"}
+    else:
+        code, stats = generate_candidate(candidate)
+    candidate["fixed_code"] = code
+    if stats is not None:
+        candidate["generation_stats"] = stats
+    candidate.update(run_tests_node(candidate))
+    return candidate
+
+def _mean_analysis_seconds():
+    with _analysis_lock:
+        if not _analysis_totals["count"]:
+            return None
+        return _analysis_totals["seconds"] / _analysis_totals["count"]
+
+def speculative_fix_node(state: State):
+    """
+    First attempt with the analysis and a direct fix running concurrently.
+    A passing direct fix cancels the analysis and goes straight to
+    evaluate_result; otherwise the analysis is awaited and generate_fix
+    continues as in the normal first attempt. state["speculative"] records
+    the hit and the latency saved (negative: the wait a miss added). A
+    proven fix from the fix index is tested as the direct fix instead of a
+    model draw, and proven reasoning stands in for the analysis.
+    """
+    proven = lookup_proven_fix(state)
+    proven_code = proven["fixed_code"] if proven is not None and REUSE_FIXES else ""
+    proven_reasoning = proven["reasoning"] if proven is not None else ""
+    # a proven diagnosis makes the analysis free and there is no proven fix to test early
+    if proven_reasoning and not proven_code:
+        update = analyze_bug_node(state)
+        update["speculative"] = {}
+        return update
+
+    start = time.perf_counter()
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    if proven_reasoning:
+        analysis = executor.submit(lambda: (proven_reasoning, 0.0))
+    else:
+        analysis = submit_in_context(executor, _analyze, state, cancel)
+    if proven_code:
+        print(f"Testing the proven fix from the fix index (run {proven['run_id']}) as the speculative candidate...")
+    else:
+        print("Speculating a direct fix while analyzing the bug...")
+
+    try:
+        candidate = _speculate(state, proven_code)
+    except Exception as e:
+        print(f"Speculative fix failed: {e}")
+        candidate = None
+    speculative_s = time.perf_counter() - start
+
+    if candidate is not None and candidate.get("result") == "pass":
+        cancel.set()
+        # a non-streaming wait for the first token cannot be interrupted, don't block on it
+        executor.shutdown(wait=False)
+        elapsed = time.perf_counter() - start
+        if analysis.done() and not analysis.exception() and analysis.result() is not None:
+            analysis_s = analysis.result()[1]
+        else:
+            analysis_s = _mean_analysis_seconds()
+        # the sequential path would have run the analysis, then the same fix + test
+        saved_s = None if analysis_s is None else round(analysis_s + speculative_s - elapsed, 3)
+        update = {field: candidate[field] for field in _CANDIDATE_FIELDS if field in candidate}
+        update["tried_candidates"] = candidate["tried_candidates"]
+        update["reasoning"] = proven_reasoning
+        update["reasoning_source"] = "fix_index" if proven_code else "speculative"
+        update["speculative"] = {
+            "hit": True,
+            "elapsed_s": round(elapsed, 3),
+            "speculative_s": round(speculative_s, 3),
+            "analysis_s": None if analysis_s is None else round(analysis_s, 3),
+            "saved_s": saved_s,
+        }
+        print(f"Speculative fix passed — analysis skipped, est. latency saved: {saved_s}s")
+        print("Speculative Fix:\n", update["fixed_code"])
+        return update
+
+    try:
+        reasoning, analysis_s = analysis.result()
+    finally:
+        executor.shutdown(wait=False)
+    elapsed = time.perf_counter() - start
+    update = {"error_type": "UnknownError", "reasoning": reasoning,
+              "reasoning_source": "fix_index" if proven_reasoning else "model"}
+    if candidate is not None:
+        # the failed direct fix is not an attempt, but an identical later fix is a duplicate
+        update["tried_candidates"] = candidate["tried_candidates"]
+        update["samples_tested"] = state.get("samples_tested", 0) + 1
+    update["speculative"] = {
+        "hit": False,
+        "elapsed_s": round(elapsed, 3),
+        "speculative_s": round(speculative_s, 3),
+        "analysis_s": round(analysis_s, 3),
+        "saved_s": round(min(0.0, analysis_s - elapsed), 3),
+    }
+    print(f"Speculative fix {'failed its tests' if candidate is not None else 'unavailable'} — continuing with the analysis")
+    print("Reasoning:\n", reasoning)
+    return update
+
+def route_speculation(state: State):
+    """After speculative_fix: a passing fix is evaluated directly, anything else goes on to the fix step."""
+    return "evaluate" if (state.get("speculative") or {}).get("hit") else "fix"
+
+def summarize_speculation(records: list) -> dict:
+    """Hit rate and latency saved over the states / results records of a speculative run."""
+    entries = [record["speculative"] for record in records
+               if record and record.get("speculative") and "hit" in record["speculative"]]
+    hits = sum(1 for entry in entries if entry["hit"])
+    saved = [entry["saved_s"] for entry in entries if entry.get("saved_s") is not None]
+    return {
+        "speculated": len(entries),
+        "hits": hits,
+        "hit_rate": round(hits / len(entries) * 100, 2) if entries else 0.0,
+        "saved_s_total": round(sum(saved), 3),
+        "saved_s_mean": round(sum(saved) / len(saved), 3) if saved else None,
+    }
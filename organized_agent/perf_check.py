@@ -0,0 +1,160 @@
+import math
+import threading
+
+from organized_agent.problem_store import problem_field
+from organized_agent.sandbox import TEST_TIMEOUT_SECONDS, get_sandbox_pool
+
+# time accepted fixes against the canonical solution (off by default: it costs extra sandbox runs)
+PERF_CHECK_ENABLED = False
+# a passing fix slower than this multiple of the canonical solution is sent back for another attempt
+SLOWDOWN_THRESHOLD = 10.0
+# only record the measurements, never fail a fix on them
+PERF_RECORD_ONLY = False
+
+# timed samples per solution; the fastest one is used (least disturbed by other load)
+PERF_REPEATS = 5
+# each sample loops the suite until it takes at least this long, so tiny suites are measurable
+MIN_SAMPLE_SECONDS = 0.005
+# stop sampling once this much time was spent in one solution's suite
+MAX_TIMED_SECONDS = 2.0
+# suite times below this are treated as equal (timer noise)
+MIN_SUITE_SECONDS = 1e-6
+# how much slower the suite may run under tracemalloc than untraced
+TRACEMALLOC_OVERHEAD = 4
+# wall-clock and CPU budget of one measurement. A suite that passed run_tests takes at most
+# TEST_TIMEOUT_SECONDS once; sampling stops after MAX_TIMED_SECONDS, overshooting by at most
+# the calibration run and one sample, and the traced run comes on top
+PERF_TIMEOUT_SECONDS = MAX_TIMED_SECONDS + (2 + TRACEMALLOC_OVERHEAD) * TEST_TIMEOUT_SECONDS
+
+# the test suite is compiled once and executed repeatedly in a fresh namespace copy;
+# peak memory comes from one extra run under tracemalloc
+PERF_HARNESS = '''
+import time as _perf_time
+import tracemalloc as _perf_tracemalloc
+
+_perf_tests = compile({test_code!r}, "<tests>", "exec")
+_perf_globals = dict(globals())
+
+def _perf_suite(number):
+    start = _perf_time.perf_counter()
+    for _ in range(number):
+        exec(_perf_tests, dict(_perf_globals))
+    return _perf_time.perf_counter() - start
+
+_perf_number = 1
+while True:
+    _perf_elapsed = _perf_suite(_perf_number)
+    if _perf_elapsed >= {min_sample} or _perf_number >= 1 << 16:
+        break
+    _perf_number *= 2
+_perf_samples = [_perf_elapsed / _perf_number]
+_perf_spent = _perf_elapsed
+while len(_perf_samples) < {repeats} and _perf_spent < {max_seconds}:
+    _perf_elapsed = _perf_suite(_perf_number)
+    _perf_spent += _perf_elapsed
+    _perf_samples.append(_perf_elapsed / _perf_number)
+
+_perf_tracemalloc.start()
+exec(_perf_tests, dict(_perf_globals))
+_perf_peak = _perf_tracemalloc.get_traced_memory()[1]
+_perf_tracemalloc.stop()
+
+_perf_result = {{
+    "seconds": min(_perf_samples),
+    "median_seconds": sorted(_perf_samples)[len(_perf_samples) // 2],
+    "samples": len(_perf_samples),
+    "loops": _perf_number,
+    "peak_kb": _perf_peak / 1024,
+}}
+'''
+
+
+def measure_suite(code: str, test_code: str, pool=None) -> dict:
+    """
+    Time the test suite against code in the sandbox: {status, seconds,
+    median_seconds, samples, loops, peak_kb}, or {status, error_type,
+    error_message} when the run did not finish cleanly.
+    """
+    pool = pool or get_sandbox_pool()
+    harness = PERF_HARNESS.format(test_code=test_code, min_sample=MIN_SAMPLE_SECONDS, repeats=PERF_REPEATS,
+                                  max_seconds=MAX_TIMED_SECONDS)
+    # tracemalloc would slow every timed loop, the harness traces its own last run
+    outcome = pool.run(f"{code}\n\n{harness}", collect="_perf_result", trace_memory=False,
+                       timeout=PERF_TIMEOUT_SECONDS, cpu_limit_seconds=math.ceil(PERF_TIMEOUT_SECONDS))
+    if outcome["status"] != "pass" or not outcome.get("collected"):
+        return {"status": "fail", "error_type": outcome.get("error_type") or "PerfCheckError",
+                "error_message": outcome.get("error_message") or "no measurement collected"}
+    return {"status": "pass", **outcome["collected"]}
+
+
+_BASELINES = {}
+_BASELINES_LOCK = threading.Lock()
+
+def canonical_baseline(state: dict, pool=None) -> dict:
+    """Measurement of declaration + canonical_solution for the state's problem, cached per task."""
+    task_id = state.get("problem_id", "")
+    with _BASELINES_LOCK:
+        baseline = _BASELINES.get(task_id)
+    if baseline is None:
+        reference = problem_field(state, "declaration") + problem_field(state, "expected_solution")
+        baseline = measure_suite(reference, problem_field(state, "test_code"), pool)
+        with _BASELINES_LOCK:
+            _BASELINES[task_id] = baseline
+    return baseline
+
+
+def compare_to_canonical(state: dict, code: str, pool=None) -> dict:
+    """
+    Runtime and memory of a passing candidate relative to the canonical
+    solution. slowdown / memory_ratio are None when either side could not be
+    measured; "slow" is set when slowdown exceeds SLOWDOWN_THRESHOLD, or
+    when the candidate timed out where the canonical solution finished.
+    """
+    test_code = problem_field(state, "test_code")
+    candidate = measure_suite(code, test_code, pool)
+    baseline = canonical_baseline(state, pool)
+
+    perf = {
+        "candidate_seconds": candidate.get("seconds"),
+        "canonical_seconds": baseline.get("seconds"),
+        "candidate_peak_kb": candidate.get("peak_kb"),
+        "canonical_peak_kb": baseline.get("peak_kb"),
+        "slowdown": None,
+        "memory_ratio": None,
+        "threshold": SLOWDOWN_THRESHOLD,
+        "slow": False,
+    }
+    if candidate["status"] != "pass":
+        perf["error"] = f"{candidate['error_type']}: {candidate['error_message']}"
+        # only a budget the canonical solution met makes a timeout a verdict, not a slow machine
+        perf["slow"] = candidate["error_type"] == "TimeoutError" and baseline["status"] == "pass"
+        return perf
+    if baseline["status"] != "pass":
+        perf["error"] = f"canonical {baseline['error_type']}: {baseline['error_message']}"
+        return perf
+
+    perf["slowdown"] = max(candidate["seconds"], MIN_SUITE_SECONDS) / max(baseline["seconds"], MIN_SUITE_SECONDS)
+    if baseline["peak_kb"]:
+        perf["memory_ratio"] = candidate["peak_kb"] / baseline["peak_kb"]
+    perf["slow"] = perf["slowdown"] > SLOWDOWN_THRESHOLD
+    return perf
+
+
+def summarize_perf(records: list) -> dict:
+    """Slowdown statistics over the states / results records that carry a perf measurement."""
+    slowdowns = sorted(record["perf"]["slowdown"] for record in records
+                       if record and record.get("perf") and record["perf"].get("slowdown") is not None)
+    return {
+        "measured": len(slowdowns),
+        "median_slowdown": round(slowdowns[len(slowdowns) // 2], 2) if slowdowns else None,
+        "max_slowdown": round(slowdowns[-1], 2) if slowdowns else None,
+        "slow": sum(1 for record in records if record and (record.get("perf") or {}).get("slow")),
+    }
+
+
+def format_perf_summary(perf: dict) -> str:
+    """One-line report of summarize_perf output ("n/a" when nothing was measured)."""
+    median = "n/a" if perf["median_slowdown"] is None else f"{perf['median_slowdown']}x"
+    worst = "n/a" if perf["max_slowdown"] is None else f"{perf['max_slowdown']}x"
+    return (f"Performance vs canonical: {perf['measured']} fixes measured, median slowdown {median}, "
+            f"max {worst}, {perf['slow']} over the threshold")
@@ -0,0 +1,298 @@
+import ast
+import builtins
+import symtable
+import sys
+
+# checks run before a candidate reaches the sandbox; remove one to disable it
+PREFLIGHT_CHECKS = ("signature", "imports", "undefined_names", "return_paths")
+
+# checks whose findings can be wrong about a passing candidate (e.g. a branch the
+# tests never reach): the candidate still runs and the finding becomes a hint
+ADVISORY_CHECKS = ("return_paths",)
+
+# also reject renamed parameters and changed default values (calls in the
+# tests are positional, so these only break tests that pass keywords)
+STRICT_SIGNATURE = False
+
+_MODULE_DUNDERS = {"__name__", "__doc__", "__builtins__", "__spec__", "__loader__", "__package__", "__file__"}
+_BUILTIN_NAMES = set(dir(builtins)) | _MODULE_DUNDERS
+
+
+def _diagnostic(error_type: str, message: str, code: str, lineno: int = None, function: str = "<module>") -> dict:
+    """last_error-shaped dict with a traceback pointing at the offending line."""
+    trace = "Pre-flight check (candidate was not executed):\n"
+    lines = code.splitlines()
+    if lineno and 0 < lineno <= len(lines):
+        trace += f'  File "<candidate>", line {lineno}, in {function}\n    {lines[lineno - 1].strip()}\n'
+    trace += f"{error_type}: {message}"
+    return {"type": error_type, "message": message, "traceback": trace}
+
+
+def _find_function(tree: ast.Module, name: str):
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+            return node
+    return None
+
+
+def _describe(fn) -> str:
+    return f"{fn.name}({ast.unparse(fn.args)})"
+
+
+def _check_signature(fn, reference) -> dict:
+    """The candidate must accept every call the reference signature accepts."""
+    args, ref = fn.args, reference.args
+    positional = args.posonlyargs + args.args
+    ref_positional = ref.posonlyargs + ref.args
+    required = len(positional) - len(args.defaults)
+    ref_required = len(ref_positional) - len(ref.defaults)
+    expected = _describe(reference)
+
+    if required > ref_required:
+        return (f"{fn.name}() requires {required} positional arguments but the original takes {ref_required} "
+                f"(function signature mismatch, expected {expected})", fn.lineno)
+    if args.vararg is None and len(positional) < len(ref_positional):
+        return (f"{fn.name}() takes {len(positional)} positional arguments but the original accepts {len(ref_positional)} "
+                f"(function signature mismatch, expected {expected})", fn.lineno)
+    if ref.vararg is not None and args.vararg is None:
+        return f"{fn.name}() dropped *{ref.vararg.arg} (function signature mismatch, expected {expected})", fn.lineno
+    if ref.kwarg is not None and args.kwarg is None:
+        return f"{fn.name}() dropped **{ref.kwarg.arg} (function signature mismatch, expected {expected})", fn.lineno
+    kwonly = {arg.arg for arg, default in zip(args.kwonlyargs, args.kw_defaults) if default is None}
+    missing_kwonly = kwonly - {arg.arg for arg in ref.kwonlyargs}
+    if missing_kwonly:
+        return (f"{fn.name}() requires keyword-only arguments {sorted(missing_kwonly)} "
+                f"(function signature mismatch, expected {expected})", fn.lineno)
+
+    if STRICT_SIGNATURE:
+        names = [arg.arg for arg in positional]
+        ref_names = [arg.arg for arg in ref_positional]
+        if names[:len(ref_names)] != ref_names:
+            return f"parameters {names} differ from the original {ref_names} (function signature mismatch)", fn.lineno
+        defaults, ref_defaults = _defaults(args), _defaults(ref)
+        if any(defaults.get(name) != value for name, value in ref_defaults.items()):
+            return (f"default values {defaults} differ from the original {ref_defaults} "
+                    f"(function signature mismatch)", fn.lineno)
+    return None
+
+
+def _defaults(args: ast.arguments) -> dict:
+    """Parameter name -> default value source."""
+    positional = args.posonlyargs + args.args
+    named = dict(zip([arg.arg for arg in positional[len(positional) - len(args.defaults):]],
+                     map(ast.unparse, args.defaults)))
+    named.update({arg.arg: ast.unparse(default) for arg, default in zip(args.kwonlyargs, args.kw_defaults)
+                  if default is not None})
+    return named
+
+
+def _check_imports(tree: ast.Module):
+    """Only the standard library is available to the tests."""
+    stdlib = getattr(sys, "stdlib_module_names", None)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                return "attempted relative import with no known parent package", node.lineno
+            modules = [node.module or ""]
+        else:
+            continue
+        for module in modules:
+            top = module.split(".")[0]
+            if stdlib is not None and top not in stdlib and top != "__future__":
+                return f"No module named '{top}' (only the standard library is available)", node.lineno
+    return None
+
+
+def _module_bindings(table: symtable.SymbolTable) -> set:
+    """Names bound at module level, including `global` assignments inside functions."""
+    bound = {sym.get_name() for sym in table.get_symbols()
+             if sym.is_assigned() or sym.is_imported() or sym.is_namespace()}
+    stack = list(table.get_children())
+    while stack:
+        child = stack.pop()
+        bound |= {sym.get_name() for sym in child.get_symbols() if sym.is_declared_global() and sym.is_assigned()}
+        stack.extend(child.get_children())
+    return bound
+
+
+def _first_load(tree: ast.AST, name: str):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == name and isinstance(node.ctx, ast.Load):
+            return node.lineno
+    return None
+
+
+def _check_undefined_names(code: str, tree: ast.Module, test_code: str):
+    """
+    Names read by the candidate that nothing binds. Module-level code (including
+    annotations, defaults and decorators) runs before the tests are defined, so
+    it only sees the candidate's own bindings; function bodies run when the
+    tests call them and also see the test module's top-level names.
+    """
+    if any(isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names) for node in ast.walk(tree)):
+        return None
+
+    table = symtable.symtable(code, "<candidate>", "exec")
+    candidate_bound = _module_bindings(table)
+    test_bound = set()
+    try:
+        test_bound = _module_bindings(symtable.symtable(test_code or "", "<tests>", "exec"))
+    except SyntaxError:
+        pass
+
+    for sym in table.get_symbols():
+        name = sym.get_name()
+        if sym.is_referenced() and name not in candidate_bound and name not in _BUILTIN_NAMES:
+            return name, "<module>"
+
+    visible = candidate_bound | test_bound | _BUILTIN_NAMES
+    stack = [(child, child.get_name()) for child in table.get_children()]
+    while stack:
+        scope, owner = stack.pop(0)
+        # lazily evaluated annotation scopes (PEP 649) never raise at definition time
+        if str(getattr(scope.get_type(), "value", scope.get_type())) == "annotation":
+            continue
+        for sym in scope.get_symbols():
+            if sym.is_global() and sym.is_referenced() and sym.get_name() not in visible:
+                return sym.get_name(), owner
+        stack.extend((child, owner) for child in scope.get_children())
+    return None
+
+
+def _loop_breaks(body: list) -> bool:
+    """Whether a reachable `break` in the statements leaves the enclosing loop."""
+    for stmt in body:
+        if isinstance(stmt, ast.Break):
+            return True
+        if isinstance(stmt, (ast.For, ast.AsyncFor, ast.While)):
+            # a break in a nested loop body ends that loop, its else block belongs to ours
+            if _loop_breaks(stmt.orelse):
+                return True
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            pass
+        elif isinstance(stmt, ast.Match):
+            if any(_loop_breaks(case.body) for case in stmt.cases):
+                return True
+        else:
+            blocks = [getattr(stmt, field, []) for field in ("body", "orelse", "finalbody")]
+            blocks += [handler.body for handler in getattr(stmt, "handlers", [])]
+            if any(_loop_breaks(block) for block in blocks):
+                return True
+        # statements after one that always leaves are dead code
+        if isinstance(stmt, ast.Continue) or _always_returns([stmt]):
+            return False
+    return False
+
+
+def _always_returns(body: list) -> bool:
+    """Whether every path through the statements ends in return/raise."""
+    if not body:
+        return False
+    last = body[-1]
+    if isinstance(last, (ast.Return, ast.Raise)):
+        return True
+    if isinstance(last, ast.Assert) and isinstance(last.test, ast.Constant) and not last.test.value:
+        return True
+    if isinstance(last, ast.If):
+        return _always_returns(last.body) and _always_returns(last.orelse)
+    if isinstance(last, (ast.With, ast.AsyncWith)):
+        return _always_returns(last.body)
+    if isinstance(last, ast.Try):
+        if _always_returns(last.finalbody):
+            return True
+        # without an exception the body runs, then the else block (if any)
+        main = _always_returns(last.body) or _always_returns(last.orelse)
+        return main and all(_always_returns(handler.body) for handler in last.handlers)
+    if isinstance(last, (ast.For, ast.AsyncFor, ast.While)):
+        if _loop_breaks(last.body):
+            return False
+        # `while True` without break only leaves through return/raise
+        if isinstance(last, ast.While) and isinstance(last.test, ast.Constant) and bool(last.test.value):
+            return True
+        # without a break every way out of the loop runs the else block
+        return _always_returns(last.orelse)
+    if isinstance(last, ast.Match):
+        has_wildcard = any(isinstance(case.pattern, ast.MatchAs) and case.pattern.pattern is None and case.guard is None
+                           for case in last.cases)
+        return has_wildcard and all(_always_returns(case.body) for case in last.cases)
+    if isinstance(last, ast.Expr) and isinstance(last.value, ast.Call):
+        func = last.value.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", "")
+        return name in ("exit", "_exit", "abort")
+    return False
+
+
+def _returns_value(reference) -> bool:
+    """Whether the original function is expected to return a value."""
+    annotation = reference.returns
+    if annotation is not None:
+        text = ast.unparse(annotation)
+        return not any(word in text for word in ("None", "Optional", "Any", "NoReturn"))
+    return any(isinstance(node, ast.Return) and node.value is not None for node in ast.walk(reference))
+
+
+def _check_return_paths(fn, reference):
+    if any(isinstance(node, (ast.Yield, ast.YieldFrom)) for node in ast.walk(fn)):
+        return None
+    if not _returns_value(reference):
+        return None
+    if not any(isinstance(node, ast.Return) and node.value is not None for node in ast.walk(fn)):
+        return f"{fn.name}() never returns a value but the original function does", fn.lineno
+    if not _always_returns(fn.body):
+        end = fn.body[-1]
+        return f"{fn.name}() can reach the end of the function without a return statement and would return None", end.lineno
+    return None
+
+
+def reference_function(declaration: str, buggy_code: str):
+    """Parse the original function (declaration + buggy body, or the bare declaration)."""
+    for source in (declaration + buggy_code, declaration + "    pass\n"):
+        try:
+            return ast.parse(source)
+        except SyntaxError:
+            continue
+    return None
+
+
+def preflight_check(code: str, entry_point: str, declaration: str = "", buggy_code: str = "", test_code: str = ""):
+    """
+    Cheap static checks of a candidate that already compiles. Returns None when
+    it looks runnable, otherwise a last_error-compatible dict (type, message,
+    traceback) describing the first problem found. Findings of ADVISORY_CHECKS
+    carry "advisory": True: the candidate should still be run.
+    """
+    tree = ast.parse(code)
+    fn = _find_function(tree, entry_point)
+    if fn is None:
+        return _diagnostic("NameError", f"name '{entry_point}' is not defined (the candidate has no top-level def {entry_point})", code)
+
+    reference_tree = reference_function(declaration, buggy_code) if declaration else None
+    reference = _find_function(reference_tree, entry_point) if reference_tree is not None else None
+
+    if "signature" in PREFLIGHT_CHECKS and reference is not None:
+        problem = _check_signature(fn, reference)
+        if problem:
+            return _diagnostic("TypeError", problem[0], code, problem[1], fn.name)
+
+    if "imports" in PREFLIGHT_CHECKS:
+        problem = _check_imports(tree)
+        if problem:
+            return _diagnostic("ModuleNotFoundError", problem[0], code, problem[1])
+
+    if "undefined_names" in PREFLIGHT_CHECKS:
+        problem = _check_undefined_names(code, tree, test_code)
+        if problem:
+            name, owner = problem
+            return _diagnostic("NameError", f"name '{name}' is not defined", code, _first_load(tree, name), owner)
+
+    if "return_paths" in PREFLIGHT_CHECKS and reference is not None:
+        problem = _check_return_paths(fn, reference)
+        if problem:
+            diagnostic = _diagnostic("MissingReturn", problem[0], code, problem[1], fn.name)
+            diagnostic["advisory"] = "return_paths" in ADVISORY_CHECKS
+            return diagnostic
+
+    return None
+
@@ -0,0 +1,146 @@
+import functools
+import json
+import mmap
+import os
+import threading
+
+RAW_DATASET_PATH = os.path.join("data", "raw", "humanevalpack_python.jsonl")
+INDEX_SUFFIX = ".idx.json"
+
+
+class ProblemStore:
+    """
+    Read-only, memory-mapped view of the local HumanEvalPack JSONL.
+    A sidecar index (<file>.idx.json) stores the byte offset of every line and
+    its task_id, so a problem is decoded only when it is looked up, by
+    position or by task_id, in O(1). The index is rebuilt when the JSONL changes.
+    """
+
+    def __init__(self, path: str = RAW_DATASET_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"{path} not found. Fetch it once with: python -m organized_agent.dataset_loader fetch"
+            )
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self._offsets, self._task_ids = self._load_or_build_index()
+        self._positions = {task_id: i for i, task_id in enumerate(self._task_ids)}
+
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets else b""
+
+    def _fingerprint(self) -> dict:
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _load_or_build_index(self):
+        fingerprint = self._fingerprint()
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get("source") == fingerprint:
+                return index["offsets"], index["task_ids"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return build_index(self.path)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def task_ids(self) -> list:
+        return list(self._task_ids)
+
+    def get(self, index: int) -> dict:
+        """Decode and return the problem at the given position."""
+        offset, length = self._offsets[index]
+        return json.loads(self._mmap[offset:offset + length])
+
+    def get_by_task_id(self, task_id: str) -> dict:
+        return self.get(self._positions[task_id])
+
+    def position_of(self, task_id: str) -> int:
+        return self._positions[task_id]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get(index)
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+def build_index(path: str = RAW_DATASET_PATH):
+    """Scan the JSONL once, write its offset index next to it and return (offsets, task_ids)."""
+    offsets, task_ids = [], []
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                offsets.append([offset, len(line)])
+                task_ids.append(json.loads(line)["task_id"])
+            offset += len(line)
+
+    stat = os.stat(path)
+    index = {
+        "source": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "offsets": offsets,
+        "task_ids": task_ids,
+    }
+    tmp_path = f"{path}{INDEX_SUFFIX}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path + INDEX_SUFFIX)
+    print(f"Indexed {len(offsets)} problems from {path}")
+    return offsets, task_ids
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+def get_problem_store() -> ProblemStore:
+    """Return the shared problem store, opening it on first use."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = ProblemStore()
+        return _STORE
+
+
+# graph-state name -> dataset key of the immutable problem fields; the slim
+# state only carries problem_id and nodes look these up here
+PROBLEM_FIELDS = {
+    "buggy_code": "buggy_solution",
+    "expected_solution": "canonical_solution",
+    "test_code": "test",
+    "declaration": "declaration",
+    "docstring_description": "docstring",
+    "human_question": "instruction",
+    "failure_symptoms": "failure_symptoms",
+}
+
+# decoded problems kept around, so the nodes of one attempt decode a problem once
+PROBLEM_CACHE_SIZE = 64
+
+@functools.lru_cache(maxsize=PROBLEM_CACHE_SIZE)
+def problem_by_task_id(task_id: str) -> dict:
+    """Decoded problem for task_id (shared, treat as read-only)."""
+    return get_problem_store().get_by_task_id(task_id)
+
+def problem_field(state: dict, name: str, default: str = ""):
+    """
+    Immutable problem field (a PROBLEM_FIELDS name) for the state's problem_id.
+    A value present in the state itself wins, e.g. in hand-built states.
+    """
+    if name in state:
+        return state[name]
+    task_id = state.get("problem_id")
+    if not task_id:
+        return default
+    return problem_by_task_id(task_id).get(PROBLEM_FIELDS[name], default)
+
+def with_problem_fields(state: dict) -> dict:
+    """Copy of the state with every PROBLEM_FIELDS entry filled in (for prompt building)."""
+    return {**{name: problem_field(state, name) for name in PROBLEM_FIELDS}, **state}
@@ -0,0 +1,178 @@
+import contextvars
+import functools
+import time
+
+from organized_agent.scheduler import get_budget
+from organized_agent.state_schema import PROFILE_SIZE
+
+# also record the serialized size of the state after every node (what a checkpointer stores)
+MEASURE_STATE_SIZE = False
+
+_serializer = None
+
+# collector of the node call currently running in this context
+_collector = contextvars.ContextVar("node_collector", default=None)
+
+
+def record_llm_call(seconds: float, prompt_tokens=None, completion_tokens=None, cached: bool = False):
+    """Attach one model call (latency + token usage) to the running node, if any, and charge the batch budget."""
+    if not cached:
+        get_budget().charge(seconds, (prompt_tokens or 0) + (completion_tokens or 0))
+    collector = _collector.get()
+    if collector is not None:
+        collector["llm_calls"].append({
+            "seconds": seconds,
+            "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "cached": cached,
+        })
+
+
+def record_test_run(exec_seconds: float, peak_memory_kb=None, memoized: bool = False):
+    """Attach one test execution to the running node, if any."""
+    collector = _collector.get()
+    if collector is not None:
+        collector["test_runs"].append({
+            "seconds": exec_seconds,
+            "peak_memory_kb": peak_memory_kb,
+            "memoized": memoized,
+        })
+
+
+def record_preflight(seconds: float, rejected: bool):
+    """Attach one static pre-flight check of a candidate to the running node, if any."""
+    collector = _collector.get()
+    if collector is not None:
+        collector["preflight"].append({"seconds": seconds, "rejected": rejected})
+
+
+def record_prompt(sent_tokens: int, legacy_tokens: int, stable_prefix_tokens: int = 0):
+    """
+    Attach the estimated size of one prompt to the running node: tokens sent,
+    what the legacy layout would have sent, and the prefix shared by every
+    call of the problem (reusable from the server's prompt cache).
+    """
+    collector = _collector.get()
+    if collector is not None:
+        collector["prompts"].append({
+            "sent": sent_tokens,
+            "legacy": legacy_tokens,
+            "prefix": stable_prefix_tokens,
+        })
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's node collector visible in the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# profile entry counters added up per node in profile_summary
+_SUMMED_FIELDS = (
+    "seconds", "llm_calls", "llm_cached", "llm_seconds", "prompt_tokens", "completion_tokens",
+    "preflight_us", "preflight_rejected", "prompts", "prompt_tokens_est", "legacy_prompt_tokens_est",
+    "prefix_tokens_est", "test_runs", "test_memoized", "test_seconds",
+)
+
+
+def add_to_summary(summary: dict, entry: dict) -> dict:
+    """New per-node summary with one profile entry counted: calls, max_seconds, peak memory and summed counters."""
+    summary = dict(summary or {})
+    node = dict(summary.get(entry["node"]) or {"calls": 0, "max_seconds": 0.0})
+    node["calls"] += 1
+    node["max_seconds"] = max(node["max_seconds"], entry["seconds"])
+    for key in _SUMMED_FIELDS:
+        if key in entry:
+            node[key] = round(node.get(key, 0) + entry[key], 4)
+    if entry.get("test_peak_memory_kb") is not None:
+        node["test_peak_memory_kb"] = max(node.get("test_peak_memory_kb") or 0, entry["test_peak_memory_kb"])
+    summary[entry["node"]] = node
+    return summary
+
+
+def prompt_savings(summary: dict) -> dict:
+    """
+    Estimated prompt tokens of one problem: sent, what the legacy layout would
+    have sent, and the prefill left once the server caches the stable prefix
+    (paid in full by the first call only). saved = legacy - prefill.
+    """
+    nodes = [node for node in (summary or {}).values() if node.get("prompts")]
+    sent = sum(node["prompt_tokens_est"] for node in nodes)
+    legacy = sum(node["legacy_prompt_tokens_est"] for node in nodes)
+    prefix = sum(node["prefix_tokens_est"] for node in nodes)
+    # the stable prefix is the same for every call of a problem
+    first_prefix = round(nodes[0]["prefix_tokens_est"] / nodes[0]["prompts"]) if nodes else 0
+    prefill = sent - prefix + first_prefix
+    return {
+        "prompt_tokens_est": sent,
+        "legacy_prompt_tokens_est": legacy,
+        "prefill_tokens_est": prefill,
+        "prompt_tokens_saved_est": legacy - prefill,
+    }
+
+
+def serialized_size(value) -> int:
+    """Bytes of value in the checkpointer's serialization format."""
+    global _serializer
+    if _serializer is None:
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+        _serializer = JsonPlusSerializer()
+    return len(_serializer.dumps_typed(value)[1])
+
+
+def timed_node(name: str, fn):
+    """
+    Wrap a graph node so every call appends an entry to state["profile"]:
+    wall time, the attempt number, model calls and tokens, and test runs
+    with their execution time and peak memory. Only the last PROFILE_SIZE
+    entries are kept; state["profile_summary"] adds every call up per node.
+    With MEASURE_STATE_SIZE the serialized size of the node's update and of
+    the merged state are added to the entry.
+    """
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        attempt = state.get("retries", 0)
+
+        collector = {"llm_calls": [], "test_runs": [], "prompts": [], "preflight": []}
+        token = _collector.set(collector)
+        start = time.perf_counter()
+        try:
+            result = fn(state, *args, **kwargs)
+        finally:
+            _collector.reset(token)
+        elapsed = time.perf_counter() - start
+
+        llm_calls = collector["llm_calls"]
+        test_runs = collector["test_runs"]
+        prompts = collector["prompts"]
+        preflight = collector["preflight"]
+        entry = {"node": name, "attempt": attempt, "seconds": round(elapsed, 4)}
+        if llm_calls:
+            entry["llm_calls"] = len(llm_calls)
+            entry["llm_cached"] = sum(call["cached"] for call in llm_calls)
+            entry["llm_seconds"] = round(sum(call["seconds"] for call in llm_calls), 4)
+            entry["prompt_tokens"] = sum(call["prompt_tokens"] for call in llm_calls)
+            entry["completion_tokens"] = sum(call["completion_tokens"] for call in llm_calls)
+        if preflight:
+            entry["preflight_us"] = round(sum(check["seconds"] for check in preflight) * 1e6)
+            entry["preflight_rejected"] = sum(check["rejected"] for check in preflight)
+        if prompts:
+            entry["prompts"] = len(prompts)
+            entry["prompt_tokens_est"] = sum(prompt["sent"] for prompt in prompts)
+            entry["legacy_prompt_tokens_est"] = sum(prompt["legacy"] for prompt in prompts)
+            entry["prefix_tokens_est"] = sum(prompt["prefix"] for prompt in prompts)
+        if test_runs:
+            peaks = [run["peak_memory_kb"] for run in test_runs if run["peak_memory_kb"] is not None]
+            entry["test_runs"] = len(test_runs)
+            entry["test_memoized"] = sum(run["memoized"] for run in test_runs)
+            entry["test_seconds"] = round(sum(run["seconds"] for run in test_runs), 4)
+            entry["test_peak_memory_kb"] = max(peaks) if peaks else None
+
+        result["profile"] = (list(state.get("profile") or []) + [entry])[-PROFILE_SIZE:]
+        result["profile_summary"] = add_to_summary(state.get("profile_summary"), entry)
+        if MEASURE_STATE_SIZE:
+            entry["update_bytes"] = serialized_size(result)
+            entry["state_bytes"] = serialized_size({**state, **result})
+        return result
+
+    return wrapper
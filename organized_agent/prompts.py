@@ -0,0 +1,257 @@
+import difflib
+import re
+
+from organized_agent.agent_helper_toolbox import SYSTEM_PROMPT
+from organized_agent.problem_store import with_problem_fields
+from organized_agent.profiling import record_prompt
+
+# "prefix_stable": static rules in the system prompt, then the problem, then the
+# per-attempt feedback, so every call of a problem shares a byte-identical prefix
+# the server can keep in its prompt/KV cache. "legacy": the original prompts.
+PROMPT_LAYOUT = "prefix_stable"
+PROMPT_LAYOUTS = ("prefix_stable", "legacy")
+
+DIFF_CONTEXT_LINES = 2
+TRACEBACK_LINES = 6
+MAX_TRACEBACK_CHARS = 800
+MAX_ERROR_MESSAGE_CHARS = 300
+
+# shared by analyze_bug and generate_fix so both extend the same cached prefix
+STABLE_SYSTEM_PROMPT = """You are an expert Python code analyst fixing HumanEvalFix tasks: a function has a bug and must be corrected so that it passes its unit tests. Be concise and technical.
+
+Each request gives the problem, the buggy function, feedback from earlier attempts (if any) and then a task: ANALYZE, FIX or ANALYZE_AND_FIX.
+
+ANALYZE: explain why the function (or the last attempt) fails and how to fix it. Do NOT return any Python code. Use this format:
+1. Intended Purpose: Describe clearly what the function should achieve.
+2. Bug Location: Identify where or why the failure occurred.
+3. Error Explanation: Explain the root cause using the test feedback.
+4. Suggested Fix (in English): Describe step by step what should be changed, no code.
+5. Edge Case Handling: Note how to handle special cases.
+If the error type is TypeError, review the parameter list and operations to ensure they match the expected input types (wrong parameter count, incompatible operations such as int + str, or an incorrect return type).
+
+FIX: output the corrected function, following these requirements:
+1. The function must keep the exact same name and parameters as the original.
+2. The goal of the function is to satisfy the described behavior.
+3. Do not rename variables, remove parameters, or change the return type unless needed for correctness.
+4. Use only the Python standard library (no external imports).
+5. The corrected version must be logically complete and pass all tests.
+6. Handle edge cases safely (empty lists, zero division, invalid inputs, etc.).
+7. Return only valid Python code — no Markdown, explanations, or comments.
+8. Keep the exact same function signature: do not add or remove parameters.
+9. Ensure that variable types match the expected behavior (e.g., do not mix strings and numbers).
+10. Return values of the correct type as implied by the task description and tests.
+Make sure the function behaves correctly for typical and edge-case inputs implied by the description (e.g., positive, negative, zero, decimal values).
+
+ANALYZE_AND_FIX: do both in one reply, as a single JSON object and nothing else:
+{"diagnosis": "<the ANALYZE answer, no code>", "code": "<the FIX answer: the complete corrected function>"}"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE-like token count (words and punctuation) for comparing prompt sizes."""
+    return len(re.findall(r"\w+|[^\w\s]", text or ""))
+
+
+def buggy_function(state: dict) -> str:
+    """The buggy function with its signature (the dataset stores only the body)."""
+    return (state.get("declaration", "") + state.get("buggy_code", "")).strip()
+
+
+def compact_diff(state: dict) -> str:
+    """Unified diff from the buggy function to the last attempt."""
+    diff = difflib.unified_diff(
+        buggy_function(state).splitlines(),
+        (state.get("fixed_code") or "").strip().splitlines(),
+        fromfile="buggy",
+        tofile="last_attempt",
+        n=DIFF_CONTEXT_LINES,
+        lineterm="",
+    )
+    return "\n".join(diff)
+
+
+def _problem_block(state: dict) -> str:
+    """Everything that stays the same for all calls of one problem."""
+    return f"""### Problem
+Function: {state.get("entry_point", "")}
+Bug type: {state.get("bug_type", "")}
+Description: {state.get("docstring_description", "")}
+Instruction: {state.get("human_question", "")}
+
+### Buggy function
+{buggy_function(state)}
+"""
+
+
+def _feedback_block(state: dict) -> str:
+    """The last attempt as a diff plus a truncated traceback; empty before the first attempt."""
+    if not state.get("fixed_code"):
+        return ""
+
+    diff = compact_diff(state)
+    if not diff:
+        diff = "(identical to the buggy function)"
+
+    last_error = state.get("last_error") or {}
+    if last_error.get("assertions"):
+        # the per-assertion report already lists every failing case
+        details = f"Failing assertions:\n{last_error['assertions'][:MAX_TRACEBACK_CHARS]}"
+    else:
+        traceback_text = "\n".join((last_error.get("traceback") or "").splitlines()[-TRACEBACK_LINES:])
+        details = f"Traceback (last lines):\n{traceback_text[-MAX_TRACEBACK_CHARS:]}"
+    return f"""
+### Last attempt (attempt {state.get("retries", 0)}, diff against the buggy function)
+{diff}
+
+### Test feedback
+Error: {last_error.get("type", "UnknownError")}: {(last_error.get("message") or "")[:MAX_ERROR_MESSAGE_CHARS]}
+Hint: {state.get("error_hint", "")}
+{details}
+"""
+
+
+def analyze_prompt(state: dict, duplicate_note: str = ""):
+    """Return (system_prompt, user_prompt) for analyze_bug in the configured layout."""
+    state = with_problem_fields(state)
+    legacy = _legacy_analyze_prompt(state, duplicate_note)
+    if PROMPT_LAYOUT == "legacy":
+        return _measured(SYSTEM_PROMPT, legacy, legacy, "")
+
+    task = "### Task\nANALYZE"
+    if not state.get("fixed_code"):
+        task += " the bug in the buggy function (no attempt has been tested yet)."
+    else:
+        task += " why the last attempt failed its tests."
+    if duplicate_note:
+        task += f"\n{duplicate_note}"
+    prefix = _problem_block(state)
+    return _measured(STABLE_SYSTEM_PROMPT, prefix + _feedback_block(state) + "\n" + task, legacy, prefix)
+
+
+def fix_prompt(state: dict, duplicate_note: str = ""):
+    """Return (system_prompt, user_prompt) for generate_fix in the configured layout."""
+    state = with_problem_fields(state)
+    legacy = _legacy_fix_prompt(state, duplicate_note)
+    if PROMPT_LAYOUT == "legacy":
+        return _measured(SYSTEM_PROMPT, legacy, legacy, "")
+
+    analysis = ""
+    if state.get("reasoning"):
+        analysis = f"\n### Analysis\n{state['reasoning']}\n"
+    task = f"### Task\nFIX: output ONLY the corrected function, starting with: def {state.get('entry_point', '')}("
+    if duplicate_note:
+        task += f"\n{duplicate_note}"
+    prefix = _problem_block(state)
+    return _measured(STABLE_SYSTEM_PROMPT, prefix + _feedback_block(state) + analysis + "\n" + task, legacy, prefix)
+
+
+def fused_prompt(state: dict, duplicate_note: str = ""):
+    """
+    Return (system_prompt, user_prompt) for analyze_and_fix. Always uses the
+    prefix-stable layout; the legacy prompts have no structured-output variant.
+    """
+    state = with_problem_fields(state)
+    task = (
+        "### Task\nANALYZE_AND_FIX: reply with the JSON object "
+        f"{{\"diagnosis\": ..., \"code\": ...}}; the code must start with: def {state.get('entry_point', '')}("
+    )
+    if duplicate_note:
+        task += f"\n{duplicate_note}"
+    legacy = _legacy_analyze_prompt(state, duplicate_note) + _legacy_fix_prompt(state, duplicate_note)
+    prefix = _problem_block(state)
+    return _measured(STABLE_SYSTEM_PROMPT, prefix + _feedback_block(state) + "\n" + task, legacy, prefix)
+
+
+def _measured(system_prompt: str, user_prompt: str, legacy_prompt: str, prefix: str):
+    """Record the estimated prompt size against the legacy layout and return the prompt pair."""
+    sent = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+    legacy = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(legacy_prompt)
+    stable_prefix = estimate_tokens(system_prompt) + estimate_tokens(prefix) if prefix else 0
+    record_prompt(sent, legacy, stable_prefix)
+    return system_prompt, user_prompt
+
+
+def _legacy_analyze_prompt(state: dict, duplicate_note: str) -> str:
+    last_error = state.get("last_error", {}) or {}
+    traceback_snippet = (
+        "\n".join(last_error.get("traceback", "").splitlines()[-6:])
+        if last_error.get("traceback")
+        else ""
+    )
+    return f"""
+        You are a Python debugging expert. Analyze why the last version of this function failed its unit tests and explain how to fix it.
+
+        ### Task Description
+        {state.get("docstring_description", "")}
+
+        ### Human Instruction
+        {state.get("human_question", "")}
+
+        ### Function Name
+        {state.get("entry_point", "")}
+
+        ### Bug Type
+        {state.get("bug_type", "")}
+
+        ### Last Failed Version
+        {state.get("fixed_code", "")}
+
+        ### Test Feedback
+        Error Type: {last_error.get("type", "UnknownError")}
+        Error Message: {last_error.get("message", "")}
+        Hint: {state.get("error_hint", "")}
+        Traceback (last lines):
+        {traceback_snippet}
+        {duplicate_note}
+
+        ### Expected Output Format
+        1. Intended Purpose: Describe clearly what the function should achieve.
+        2. Bug Location: Identify where or why the failure occurred.
+        3. Error Explanation: Explain the root cause using the error info above.
+        4. Suggested Fix (in English): Describe step by step what should be changed, no code.
+        5. Edge Case Handling: Note how to handle special cases.
+
+        If the error type is TypeError, review the function’s parameter list and operations to ensure they match expected input types.
+        Possible causes: wrong parameter count, incompatible operations (e.g., int + str), "
+        or incorrect return type.
+
+
+        Rules:
+        - Do NOT return any Python code.
+        - Be concise and technical.
+        - Use the feedback above to guide your reasoning.
+        """
+
+
+def _legacy_fix_prompt(state: dict, duplicate_note: str) -> str:
+    entry_point = state.get("entry_point", "")
+    return f"""
+    You are a Python expert. Your task is to fix a buggy function so that it passes all its unit tests.
+
+    ### Problem description
+    {state.get("human_question", "") or state.get("docstring_description", "")}
+
+    ### Buggy function
+    {state.get("buggy_code", "")}
+
+    ### Your previous reasoning
+    {state.get("reasoning", "")}
+    {duplicate_note}
+
+    ### Critical requirements:
+    1. The function **must keep the exact same name and parameters** as the original:
+    - It must start exactly with: def {entry_point}(
+    2. The goal of the function is to satisfy the described behavior above.
+    3. Do **not** rename variables, remove parameters, or change the return type unless needed for correctness.
+    4. Use only the Python standard library (no external imports).
+    5. The corrected version must be **logically complete and pass all provided tests**.
+    6. Handle edge cases safely (empty lists, zero division, invalid inputs, etc.).
+    7. Return **only valid Python code** — no Markdown, explanations, or comments.
+    8. Keep the exact same function signature: do not add or remove parameters.
+    9. Ensure that variable types match the expected behavior (e.g., do not mix strings and numbers).
+    10. Return values of the correct type as implied by the task description and tests.
+
+
+    Make sure the function behaves correctly for typical and edge-case inputs implied by the description (e.g., positive, negative, zero, decimal values).
+    ### Now output ONLY the corrected function below:
+
+    """
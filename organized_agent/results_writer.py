@@ -0,0 +1,316 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import orjson
+
+RESULTS_FILE = os.path.join("data", "processed", "results_log.jsonl")
+
+# "jsonl", "jsonl.zst" (zstd frames appended per batch) or "parquet" (one file per writer session)
+RESULTS_FORMAT = "jsonl"
+RESULTS_FORMATS = ("jsonl", "jsonl.zst", "parquet")
+
+FLUSH_EVERY = 16
+FLUSH_INTERVAL_SECONDS = 2.0
+
+# "never": leave durability to the OS, "batch": fsync after every batch,
+# "always": write and fsync every record as soon as it arrives
+FSYNC_POLICY = "batch"
+FSYNC_POLICIES = ("never", "batch", "always")
+
+
+def results_path(path: str = RESULTS_FILE, fmt: str = RESULTS_FORMAT) -> str:
+    """Where records of the given format live for a base .jsonl path (parquet: a glob)."""
+    stem = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+    if fmt == "jsonl.zst":
+        return f"{stem}.jsonl.zst"
+    if fmt == "parquet":
+        return f"{stem}-*.parquet"
+    return f"{stem}.jsonl"
+
+
+def _parquet_row(record: dict) -> dict:
+    """Nested values (profile, last_error, history...) are stored as JSON text columns."""
+    return {
+        key: orjson.dumps(value).decode() if isinstance(value, (dict, list, tuple)) else value
+        for key, value in record.items()
+    }
+
+
+class ResultsWriter:
+    """
+    Single background writer for result records. Any thread may submit();
+    one thread serializes with orjson and writes in batches of flush_every
+    records or every flush_interval seconds, whichever comes first, so lines
+    from concurrent problems never interleave. Records without a run_id get
+    the writer's run_id.
+    """
+
+    def __init__(
+        self,
+        path: str = RESULTS_FILE,
+        fmt: str = RESULTS_FORMAT,
+        run_id: str = None,
+        flush_every: int = FLUSH_EVERY,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        fsync: str = FSYNC_POLICY,
+    ):
+        if fmt not in RESULTS_FORMATS:
+            raise ValueError(f"Unknown results format {fmt!r}, expected one of {RESULTS_FORMATS}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+
+        self.fmt = fmt
+        self.run_id = run_id
+        self.flush_every = 1 if fsync == "always" else flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.path_base = path
+        self.path = results_path(path, fmt)
+        self.written = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = None
+        self._parquet_writer = None
+        self._parquet_schema = None
+        if fmt == "parquet":
+            self._parquet_session = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            self._parquet_parts = 0
+            self.path = self._parquet_part_path()
+        else:
+            self._file = open(self.path, "ab")
+        if fmt == "jsonl.zst":
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(level=3)
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict):
+        """Queue one record for writing (non-blocking)."""
+        if self._closed:
+            raise RuntimeError("ResultsWriter is closed")
+        if record.get("run_id") is None and self.run_id is not None:
+            record = {**record, "run_id": self.run_id}
+        self._queue.put(record)
+
+    def flush(self):
+        """Block until everything submitted so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = "tick"
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.flush_every:
+                    continue
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    print(f"FAILED: could not write {len(batch)} result records: {e}")
+                batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write_batch(self, batch: list):
+        if self.fmt == "parquet":
+            self._write_parquet(batch)
+        else:
+            data = b"".join(orjson.dumps(record, default=str) + b"\n" for record in batch)
+            if self.fmt == "jsonl.zst":
+                # each batch is an independent zstd frame, so the file stays readable after a crash
+                data = self._compressor.compress(data)
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+        self.written += len(batch)
+
+    def _parquet_part_path(self) -> str:
+        """Next part file of this writer session (names sort in write order)."""
+        part = f"{self._parquet_session}-{self._parquet_parts:04d}"
+        self._parquet_parts += 1
+        return results_path(self.path_base, "parquet").replace("*", part)
+
+    def _write_parquet(self, batch: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = [_parquet_row(record) for record in batch]
+        schema = pa.Table.from_pylist(rows).schema
+        if self._parquet_writer is not None and not schema.equals(self._parquet_schema):
+            try:
+                # e.g. a column that was all None (type null) in earlier batches now has values
+                schema = pa.unify_schemas([self._parquet_schema, schema], promote_options="permissive")
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+            if not schema.equals(self._parquet_schema):
+                # a part file has one schema: continue in a new part (readers glob all parts)
+                self._parquet_writer.close()
+                self._parquet_writer = None
+                self.path = self._parquet_part_path()
+        if self._parquet_writer is None:
+            self._parquet_schema = schema
+            self._parquet_writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+        self._parquet_writer.write_table(pa.Table.from_pylist(rows, schema=self._parquet_schema))
+
+
+def read_results(path: str = RESULTS_FILE, fmt: str = RESULTS_FORMAT):
+    """Yield the records stored at path in any of the writer formats."""
+    location = results_path(path, fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for part in sorted(glob.glob(location)):
+            for row in pq.read_table(part).to_pylist():
+                yield row
+        return
+
+    if not os.path.exists(location):
+        return
+    if fmt == "jsonl.zst":
+        import io
+        import zstandard
+
+        with open(location, "rb") as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            lines = io.TextIOWrapper(reader, encoding="utf-8")
+            try:
+                for line in lines:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+            except zstandard.ZstdError:
+                # truncated last frame of a crashed run
+                return
+        return
+
+    with open(location, "rb") as f:
+        for line in f:
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # partially written last line of a crashed run
+                continue
+
+
+def _result_sources(source: str):
+    """(base path, format) pairs to read for an output directory or a results file."""
+    if os.path.isdir(source):
+        base = os.path.join(source, os.path.basename(RESULTS_FILE))
+        return [(base, fmt) for fmt in RESULTS_FORMATS]
+    if source.endswith(".jsonl.zst"):
+        return [(source[:-len(".zst")], "jsonl.zst")]
+    if source.endswith(".parquet"):
+        return [(source[:-len(".parquet")], "parquet")] if "*" in source else [(source, "parquet_file")]
+    return [(source, "jsonl")]
+
+
+def _has_results(base: str, fmt: str) -> bool:
+    if fmt == "parquet_file":
+        return os.path.isfile(base)
+    if fmt == "parquet":
+        return bool(glob.glob(results_path(base, fmt)))
+    return os.path.isfile(results_path(base, fmt))
+
+
+def merge_results(sources: list, output: str = None, run_id: str = None) -> list:
+    """
+    Combine the results logs of several shards (output directories or
+    results files) into one list with a single terminal record per
+    (run_id, task_id): the latest by timestamp, so reruns and overlapping
+    shards are counted once. Optionally written to output as JSONL.
+    Raises FileNotFoundError when a source has no results files.
+    """
+    # a mistyped shard would otherwise just lower the merged pass@1
+    missing = [source for source in sources
+               if not any(_has_results(base, fmt) for base, fmt in _result_sources(source))]
+    if missing:
+        raise FileNotFoundError(f"No results files found in: {', '.join(missing)}")
+
+    merged = {}
+    for source in sources:
+        for base, fmt in _result_sources(source):
+            if fmt == "parquet_file":
+                import pyarrow.parquet as pq
+
+                records = pq.read_table(base).to_pylist()
+            else:
+                records = read_results(base, fmt)
+            for record in records:
+                if record.get("result") not in ("pass", "fail"):
+                    continue
+                if run_id is not None and record.get("run_id") != run_id:
+                    continue
+                key = (record.get("run_id"), record.get("task_id"))
+                if key not in merged or (record.get("timestamp") or "") >= (merged[key].get("timestamp") or ""):
+                    merged[key] = record
+
+    records = [merged[key] for key in sorted(merged, key=lambda key: (str(key[0]), str(key[1])))]
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "wb") as f:
+            for record in records:
+                f.write(orjson.dumps(record) + b"\n")
+    return records
+
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+def configure_results_writer(**kwargs) -> ResultsWriter:
+    """Replace the shared writer (closing the previous one) with a new configuration."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is not None:
+            _WRITER.close()
+        _WRITER = ResultsWriter(**kwargs)
+        return _WRITER
+
+def get_results_writer() -> ResultsWriter:
+    """Return the shared results writer, starting it with the defaults on first use."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = ResultsWriter()
+        return _WRITER
+
+@atexit.register
+def _close_writer():
+    if _WRITER is not None:
+        _WRITER.close()
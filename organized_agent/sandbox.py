@@ -0,0 +1,270 @@
+import atexit
+import contextlib
+import io
+import linecache
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import time
+import traceback
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+SANDBOX_WORKERS = 4
+TEST_TIMEOUT_SECONDS = 10
+CPU_LIMIT_SECONDS = 10
+MEMORY_LIMIT_MB = 1024
+MAX_RUNS_PER_WORKER = 200
+MAX_OUTPUT_CHARS = 20000
+# report the peak Python allocation of every run (tracemalloc, some overhead)
+TRACE_MEMORY = True
+
+CANDIDATE_FILENAME = "<candidate>"
+
+
+def _set_limit(limit, soft, hard):
+    """Apply an rlimit, ignoring platforms that refuse it (e.g. RLIMIT_AS on macOS)."""
+    try:
+        resource.setrlimit(limit, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _used_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _execute(code: str, trace_memory: bool = TRACE_MEMORY, collect: str = None) -> dict:
+    """
+    Execute candidate + test code in a fresh namespace and describe the outcome.
+    collect names a global whose (picklable) value is returned as "collected",
+    whether or not the run failed.
+    """
+    namespace = {"__name__": "__sandbox__"}
+    output_buffer = io.StringIO()
+
+    # register the source so tracebacks show the failing lines (e.g. the assert)
+    linecache.cache[CANDIDATE_FILENAME] = (len(code), None, code.splitlines(True), CANDIDATE_FILENAME)
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(output_buffer):
+            exec(compile(code, CANDIDATE_FILENAME, "exec"), namespace)
+        result = {
+            "status": "pass",
+            "stdout": output_buffer.getvalue()[:MAX_OUTPUT_CHARS],
+        }
+    except BaseException as e:  # SystemExit from candidate code must not kill the worker
+        result = {
+            "status": "fail",
+            "stdout": output_buffer.getvalue()[:MAX_OUTPUT_CHARS],
+            "error_type": type(e).__name__,
+            "error_message": str(e)[:MAX_OUTPUT_CHARS],
+            "traceback": traceback.format_exc()[-MAX_OUTPUT_CHARS:],
+        }
+    finally:
+        if trace_memory:
+            result["peak_memory_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+    if collect:
+        result["collected"] = namespace.get(collect)
+    return result
+
+
+def _worker_main(conn, cpu_limit_seconds, memory_limit_mb):
+    """Loop of a warm worker process: receive code, run it, send back the result."""
+    if resource is not None:
+        memory_bytes = memory_limit_mb * 1024 * 1024
+        _set_limit(resource.RLIMIT_AS, memory_bytes, memory_bytes)
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+
+        # RLIMIT_CPU counts the whole life of the process, so move the soft
+        # limit forward before each run to give every job the same allowance
+        if resource is not None:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(_used_cpu_seconds()) + (job.get("cpu_limit_seconds") or cpu_limit_seconds)
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            _set_limit(resource.RLIMIT_CPU, soft, hard)
+
+        trace_memory = job.get("trace_memory")
+        conn.send(_execute(job["code"], TRACE_MEMORY if trace_memory is None else trace_memory, job.get("collect")))
+
+
+class _Worker:
+    """One warm sandbox process and the parent end of its pipe."""
+
+    def __init__(self, ctx, cpu_limit_seconds, memory_limit_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, cpu_limit_seconds, memory_limit_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+
+    def stop(self):
+        with contextlib.suppress(Exception):
+            self.conn.send(None)
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of pre-forked worker processes that execute untrusted candidate code.
+    Every run gets a wall-clock timeout and the workers run under CPU and memory
+    rlimits; a worker that hangs or dies is killed and replaced by a fresh one.
+    """
+
+    def __init__(
+        self,
+        workers: int = SANDBOX_WORKERS,
+        timeout: float = TEST_TIMEOUT_SECONDS,
+        cpu_limit_seconds: int = CPU_LIMIT_SECONDS,
+        memory_limit_mb: int = MEMORY_LIMIT_MB,
+        max_runs_per_worker: int = MAX_RUNS_PER_WORKER,
+    ):
+        # fork keeps worker startup cheap and does not re-import the main module;
+        # it is only safe while the process has no other threads, i.e. for the
+        # initial workers (see get_sandbox_pool)
+        methods = mp.get_all_start_methods()
+        self._ctx = mp.get_context("fork" if "fork" in methods else "spawn")
+        # replacements are created while batch, writer and health-check threads run:
+        # fork them from the single-threaded forkserver instead of from this process
+        self._respawn_ctx = mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if self._respawn_ctx.get_start_method() == "forkserver":
+            from multiprocessing import forkserver
+
+            # the server imports only this module, not __main__ and its dependencies
+            self._respawn_ctx.set_forkserver_preload([__name__])
+            forkserver.ensure_running()
+        self.timeout = timeout
+        self.cpu_limit_seconds = cpu_limit_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.max_runs_per_worker = max_runs_per_worker
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(workers):
+            self._idle.put(self._spawn(self._ctx))
+
+    def _spawn(self, ctx=None) -> _Worker:
+        worker = _Worker(ctx or self._respawn_ctx, self.cpu_limit_seconds, self.memory_limit_mb)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        return self._spawn()
+
+    def run(self, code: str, timeout: float = None, collect: str = None, trace_memory: bool = None,
+            cpu_limit_seconds: int = None) -> dict:
+        """
+        Run code in an idle worker and return its outcome dict:
+        status ("pass"/"fail"), stdout, and on failure error_type,
+        error_message and traceback. Also reports exec_seconds (round trip)
+        and, when memory tracing is on, peak_memory_kb. With collect, the
+        value of that global after the run is returned as "collected".
+        trace_memory overrides TRACE_MEMORY for this run (e.g. off for timing),
+        cpu_limit_seconds the pool's CPU allowance (e.g. for repeated suites).
+        """
+        if self._closed:
+            raise RuntimeError("SandboxPool is closed")
+
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        start = time.perf_counter()
+        try:
+            worker.conn.send({"code": code, "collect": collect, "trace_memory": trace_memory,
+                              "cpu_limit_seconds": cpu_limit_seconds})
+            if worker.conn.poll(timeout):
+                result = worker.conn.recv()
+                worker.runs += 1
+                if worker.runs >= self.max_runs_per_worker:
+                    worker.stop()
+                    with self._lock:
+                        self._workers.remove(worker)
+                    worker = self._spawn()
+            else:
+                result = _failure(
+                    "TimeoutError",
+                    f"Test run exceeded the {timeout}s wall-clock limit (possible infinite loop or exponential recursion).",
+                )
+                worker = self._replace(worker)
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            result = _crash_result(worker.process.exitcode)
+            worker = self._replace(worker)
+        finally:
+            self._idle.put(worker)
+
+        result["exec_seconds"] = time.perf_counter() - start
+        return result
+
+    def close(self):
+        """Stop every worker process."""
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+
+def _failure(error_type: str, message: str) -> dict:
+    return {
+        "status": "fail",
+        "stdout": "",
+        "error_type": error_type,
+        "error_message": message,
+        "traceback": f"{error_type}: {message}",
+    }
+
+
+def _crash_result(exitcode) -> dict:
+    """Translate the exit code of a dead worker into a failure result."""
+    if exitcode == -getattr(signal, "SIGXCPU", -1):
+        return _failure("TimeoutError", "Test run exceeded the CPU time limit.")
+    if exitcode == -signal.SIGKILL:
+        return _failure("MemoryError", "Sandbox worker was killed, most likely for exceeding the memory limit.")
+    return _failure("SandboxCrash", f"Sandbox worker died unexpectedly (exit code {exitcode}).")
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the shared sandbox pool, pre-forking its workers on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SandboxPool()
+            atexit.register(_POOL.close)
+        return _POOL
@@ -0,0 +1,157 @@
+import hashlib
+import re
+import threading
+import time
+
+# batch-wide compute budget; None = unlimited
+BUDGET_TOKENS = None
+BUDGET_SECONDS = None
+BUDGET_LLM_CALLS = None
+
+# failed attempts every problem gets, and the cap for problems that keep improving
+BASE_ATTEMPTS = 5
+MAX_ATTEMPTS = 8
+
+# give up after this many identical candidates in a row
+MAX_REPEATED_CANDIDATES = 2
+# give up after the same error signature this many times in a row without a better score
+MAX_REPEATED_SIGNATURES = 3
+
+# GPUs serving the model, for passes per GPU-hour (None = one per LLM endpoint)
+GPU_COUNT = None
+
+
+class BatchBudget:
+    """
+    Tokens, wall-clock seconds and model calls spent by the whole batch,
+    shared by every problem thread. Cached model calls are free.
+    """
+
+    def __init__(self, tokens: int = None, seconds: float = None, llm_calls: int = None):
+        self.limits = {"tokens": tokens, "seconds": seconds, "llm_calls": llm_calls}
+        self.started = time.monotonic()
+        self.tokens = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def charge(self, seconds: float, tokens: int):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+            self.tokens += tokens
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def exhausted(self):
+        """Name of the first limit that is used up, or None."""
+        spent = {"tokens": self.tokens, "seconds": self.elapsed(), "llm_calls": self.llm_calls}
+        for name, limit in self.limits.items():
+            if limit is not None and spent[name] >= limit:
+                return name
+        return None
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def summary(self) -> dict:
+        return {
+            "elapsed_s": round(self.elapsed(), 2),
+            "tokens": self.tokens,
+            "llm_calls": self.llm_calls,
+            "llm_seconds": round(self.llm_seconds, 2),
+            "skipped_budget": self.skipped,
+            "exhausted": self.exhausted(),
+        }
+
+
+_BUDGET = BatchBudget(BUDGET_TOKENS, BUDGET_SECONDS, BUDGET_LLM_CALLS)
+
+
+def configure_budget(tokens: int = None, seconds: float = None, llm_calls: int = None) -> BatchBudget:
+    """Start a fresh budget (and its clock) for a new batch; unset limits come from BUDGET_*."""
+    global _BUDGET
+    _BUDGET = BatchBudget(
+        BUDGET_TOKENS if tokens is None else tokens,
+        BUDGET_SECONDS if seconds is None else seconds,
+        BUDGET_LLM_CALLS if llm_calls is None else llm_calls,
+    )
+    return _BUDGET
+
+
+def get_budget() -> BatchBudget:
+    return _BUDGET
+
+
+def error_signature(error_type: str, message: str = "", assertions: str = "") -> str:
+    """
+    Short hash identifying a failure mode: the error type, the message with
+    numbers and addresses masked, and which assertions failed (not their values).
+    """
+    message = re.sub(r"0x[0-9a-fA-F]+|\d+", "#", message or "")
+    failed = re.findall(r"^FAILED line \d+: (.*)$", assertions or "", flags=re.MULTILINE)
+    text = "\n".join([error_type or "", message.strip(), *failed])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _repeated_candidates(attempts: list) -> int:
+    """Attempts at the end of the log that re-proposed an already tried candidate."""
+    streak = 0
+    for attempt in reversed(attempts):
+        if not attempt["duplicate"]:
+            break
+        streak += 1
+    return streak
+
+
+def _repeated_signature(attempts: list) -> int:
+    """Attempts at the end of the log with the last error signature and no better score."""
+    if not attempts:
+        return 0
+    last = attempts[-1]
+    streak = 1
+    for prev in reversed(attempts[:-1]):
+        if prev["signature"] != last["signature"] or last["score"] > prev["score"]:
+            break
+        streak += 1
+    return streak
+
+
+def is_improving(attempts: list) -> bool:
+    """The last attempt scored better than every earlier one."""
+    if len(attempts) < 2:
+        return False
+    return attempts[-1]["score"] > max(attempt["score"] for attempt in attempts[:-1])
+
+
+def next_action(state: dict):
+    """
+    Decide whether a failed problem gets another attempt. Returns
+    (action, stop_reason) with action "analyze_bug" or "log_result".
+    """
+    if state.get("result") == "pass":
+        return "log_result", "passed"
+
+    retries = state.get("retries", 0)
+    attempts = state.get("history") or []
+
+    exhausted = get_budget().exhausted()
+    if exhausted:
+        return "log_result", f"budget_{exhausted}"
+    if retries >= MAX_ATTEMPTS:
+        return "log_result", "max_attempts"
+    if _repeated_candidates(attempts) >= MAX_REPEATED_CANDIDATES:
+        return "log_result", "repeated_candidate"
+    if _repeated_signature(attempts) >= MAX_REPEATED_SIGNATURES:
+        return "log_result", "repeated_error"
+    if retries >= BASE_ATTEMPTS and not is_improving(attempts):
+        return "log_result", "max_attempts"
+    return "analyze_bug", ""
+
+
+def passes_per_gpu_hour(passes: int, seconds: float, gpus: int = 1) -> float:
+    gpu_hours = seconds * max(1, gpus) / 3600
+    return round(passes / gpu_hours, 1) if gpu_hours else 0.0
@@ -1,32 +1,71 @@
 from typing import TypedDict, List, Dict, Any
 
-""" Define the shared state structure for the LangGraph agent. """
+# large text fields are clipped before they enter the state (head + tail kept)
+MAX_TEST_OUTPUT_CHARS = 2000
+MAX_TRACEBACK_CHARS = 3000
+MAX_REASONING_CHARS = 6000
+
+# compact attempt summaries kept in history (oldest dropped first); at least
+# scheduler.MAX_ATTEMPTS so the retry decisions see every attempt
+HISTORY_SIZE = 8
+
+# per-node profile entries kept in the state (most recent); totals over all
+# calls live in the fixed-size per-node profile_summary
+PROFILE_SIZE = 8
+
+""" Define the shared state structure for the LangGraph agent.
+Immutable problem data (buggy code, tests, canonical solution, descriptions)
+is not copied into the state: nodes look it up by problem_id through
+problem_store.problem_field. """
 class State(TypedDict):
     # Metadata
+    run_id: str
     current_index: int
     problem_id: str
-    description: str
     bug_type: str
-    failure_symptoms: str
-
-    # Core dataset
-    buggy_code: str
-    fixed_code: str
-    expected_solution: str
-    test_code: str
     entry_point: str
-    instruction: str
 
-    # Reasoning & diagnostics
+    # Candidate & reasoning
+    fixed_code: str
     reasoning: str
+    reasoning_source: str
     error_hint: str
     test_output: str
     result: str
+    score: float
     last_error: dict
     error_type: str
     error_message: str
+    error_signature: str
+
+    # Candidate tracking
+    candidate_hash: str
+    tried_candidates: list
+    duplicate_candidate: bool
+    samples_tested: int
+    perf: dict
+    speculative: dict
+
+    # Generation metrics
+    graph_variant: str
+    generation_stats: dict
+    profile: list
+    profile_summary: dict
 
     # Retry & history
     retries: int
-    save_history: bool
+    next_action: str
+    stop_reason: str
     history: list
+
+def clip_text(text: str, limit: int) -> str:
+    """Keep the start and the (usually more informative) end of a long text."""
+    if not text or len(text) <= limit:
+        return text
+    head = limit // 4
+    tail = limit - head
+    return f"{text[:head]}\n... [{len(text) - limit} chars truncated] ...\n{text[-tail:]}"
+
+def push_history(history: list, entry: dict) -> list:
+    """New history list with entry appended, capped at HISTORY_SIZE entries."""
+    return (list(history or []) + [entry])[-HISTORY_SIZE:]
@@ -0,0 +1,62 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+
+TEST_MEMO_MAX_ENTRIES = 4096
+
+# state fields written by run_tests_node that fully describe a test outcome
+TEST_RESULT_FIELDS = ("result", "score", "test_output", "last_error", "error_type", "error_message", "error_hint", "error_signature")
+
+
+def normalize_candidate(code: str) -> str:
+    """
+    Canonical form of a candidate: the AST dump, which ignores comments,
+    blank lines and formatting. Unparsable code falls back to its stripped,
+    comment-free lines.
+    """
+    try:
+        return ast.dump(ast.parse(code))
+    except SyntaxError:
+        lines = (line.split("#", 1)[0].strip() for line in code.splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def candidate_hash(code: str) -> str:
+    return hashlib.sha256(normalize_candidate(code).encode("utf-8")).hexdigest()
+
+
+def memo_key(cand_hash: str, test_code: str) -> str:
+    return hashlib.sha256(f"{cand_hash}\0{test_code}".encode("utf-8")).hexdigest()
+
+
+class TestMemo:
+    """Thread-safe LRU map from memo_key() to the recorded test outcome fields."""
+
+    def __init__(self, max_entries: int = TEST_MEMO_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            outcome = self._entries.get(key)
+            if outcome is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(outcome)
+
+    def put(self, key: str, state: dict):
+        outcome = {field: state.get(field) for field in TEST_RESULT_FIELDS}
+        with self._lock:
+            self._entries[key] = outcome
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+TEST_MEMO = TestMemo()
@@ -1,6 +1,34 @@
+import json
+import sys
+
 import pandas as pd
 
-df = pd.read_json("data/processed/results_log1.jsonl", lines=True)
+from reports.results_warehouse import ingest, latest_records, pass_at_1_by_run, print_comparison, retry_distribution, run_ids
+
+# usage: python -m reports.eda [run_id [baseline_run_id]]  (default: the latest run)
+added = ingest()
+runs = run_ids()
+if not runs:
+    sys.exit("No results logged yet.")
+run_id = sys.argv[1] if len(sys.argv) > 1 else runs[-1]
+print(f"Ingested {added} new records; runs: {', '.join(runs)}")
+
+print("Pass@1 per run:")
+print(pass_at_1_by_run())
+print()
+print("Retry distribution per run:")
+print(retry_distribution())
+print()
+
+baseline = sys.argv[2] if len(sys.argv) > 2 else None
+if baseline:
+    print_comparison(baseline, run_id)
+    print()
+
+print(f"=== Run '{run_id}' ===")
+df = latest_records(["result", "error_type", "error_hint", "retries", "profile", "profile_summary"], runs=[run_id])
+for column in ("profile", "profile_summary"):
+    df[column] = df[column].map(lambda value: json.loads(value) if isinstance(value, str) else value)
 
 # counts by result
 counts = df["result"].value_counts()
@@ -25,3 +53,47 @@ retry_counts = df["retries"].value_counts().sort_index()
 print("Retry count distribution:")
 print(retry_counts)
 
+
+# profile view (records logged with per-node "profile" entries: the most recent
+# steps of each task; totals come from "profile_summary" when it was logged)
+if "profile" in df.columns:
+    prof = df[["task_id", "result", "timestamp", "profile"]].dropna(subset=["profile"])
+    steps = prof.explode("profile").dropna(subset=["profile"])
+    steps = pd.concat(
+        [steps[["task_id", "result"]].reset_index(drop=True), pd.json_normalize(steps["profile"].tolist())],
+        axis=1,
+    )
+
+    print()
+    print("Latency per node (seconds):")
+    print(steps.groupby("node")["seconds"].describe(percentiles=[0.5, 0.95])[["count", "50%", "95%", "max"]])
+    print()
+
+    if "test_seconds" in steps.columns:
+        tests = steps.dropna(subset=["test_seconds"])
+        print("Test execution (seconds / peak KB):")
+        print(tests[["test_seconds", "test_peak_memory_kb"]].describe(percentiles=[0.5, 0.95]).loc[["50%", "95%", "max"]])
+        print()
+
+    passes = (prof["result"] == "pass").sum()
+    token_cols = [col for col in ("prompt_tokens", "completion_tokens") if col in steps.columns]
+    total_tokens = steps[token_cols].sum().sum() if token_cols else 0
+    task_seconds = steps.groupby("task_id")["seconds"].sum()
+    summaries = df[["task_id", "profile_summary"]].dropna(subset=["profile_summary"])
+    if len(summaries):
+        nodes = [node for summary in summaries["profile_summary"] for node in summary.values()]
+        total_tokens = sum(node.get("prompt_tokens", 0) + node.get("completion_tokens", 0) for node in nodes)
+        summed = summaries.set_index("task_id")["profile_summary"].map(
+            lambda summary: sum(node["seconds"] for node in summary.values()))
+        task_seconds = summed.combine_first(task_seconds)
+
+    # run span: from the earliest task start (end timestamp minus its node time) to the last log line
+    ends = pd.to_datetime(prof.set_index("task_id")["timestamp"])
+    starts = ends - pd.to_timedelta(task_seconds.reindex(ends.index).fillna(0), unit="s")
+    wall_clock = (ends.max() - starts.min()).total_seconds()
+
+    print(f"Solved tasks: {passes}")
+    if passes:
+        print(f"Tokens per solved task: {total_tokens / passes:.0f}")
+        print(f"Node time per pass: {task_seconds.sum() / passes:.1f}s")
+        print(f"Wall clock per pass: {wall_clock / passes:.1f}s")
@@ -0,0 +1,255 @@
+import argparse
+import glob
+import json
+import os
+from urllib.parse import quote
+
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from organized_agent.results_writer import RESULTS_FILE, results_path
+
+WAREHOUSE_DIR = os.path.join("data", "processed", "warehouse")
+INGEST_STATE_FILE = "_ingest_state.json"
+
+# typed columns; everything else is stored as text (nested values as JSON)
+NUMERIC_COLUMNS = {
+    "retries": pa.int64(),
+    "samples_tested": pa.int64(),
+}
+
+
+def _default_sources() -> list:
+    """Every results log next to the default one (results_log*.jsonl and .jsonl.zst)."""
+    stem = results_path(RESULTS_FILE, "jsonl")[:-len(".jsonl")]
+    return sorted(glob.glob(f"{stem}*.jsonl") + glob.glob(f"{stem}*.jsonl.zst"))
+
+
+def _load_state(warehouse_dir: str) -> dict:
+    path = os.path.join(warehouse_dir, INGEST_STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(warehouse_dir: str, state: dict):
+    path = os.path.join(warehouse_dir, INGEST_STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _read_new_jsonl(path: str, offset: int):
+    """Records after byte offset, stopping before a partially written last line."""
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                records.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                continue
+    return records, offset
+
+
+def _read_new_zst(path: str, seen: int):
+    """zstd streams cannot be seeked, so the position is a record count."""
+    import io
+    import zstandard
+
+    records = []
+    count = 0
+    with open(path, "rb") as raw:
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        try:
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                if not line.endswith("\n"):
+                    break
+                count += 1
+                if count > seen:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except zstandard.ZstdError:
+            pass
+    return records, count
+
+
+def _to_table(records: list) -> pa.Table:
+    columns = sorted({key for record in records for key in record} - {"run_id"})
+    arrays = {}
+    for column in columns:
+        values = [record.get(column) for record in records]
+        if column in NUMERIC_COLUMNS:
+            arrays[column] = pa.array(values, type=NUMERIC_COLUMNS[column])
+        else:
+            arrays[column] = pa.array(
+                [None if value is None else value if isinstance(value, str) else orjson.dumps(value).decode()
+                 for value in values],
+                type=pa.string(),
+            )
+    return pa.table(arrays)
+
+
+def ingest(sources: list = None, warehouse_dir: str = WAREHOUSE_DIR) -> int:
+    """
+    Append the lines added to each results log since the last ingest to the
+    warehouse, one Parquet partition (run_id=<id>/) per run. Returns the
+    number of new records.
+    """
+    os.makedirs(warehouse_dir, exist_ok=True)
+    state = _load_state(warehouse_dir)
+    sources = _default_sources() if sources is None else sources
+
+    added = 0
+    for source in sources:
+        key = os.path.abspath(source)
+        entry = state.get(key, {"position": 0})
+        size = os.path.getsize(source)
+        zst = source.endswith(".zst")
+        if not zst and size < entry["position"]:
+            # log was truncated or replaced: read it again from the start
+            entry = {"position": 0}
+        if not zst and size == entry["position"]:
+            continue
+
+        if zst:
+            records, position = _read_new_zst(source, entry["position"])
+        else:
+            records, position = _read_new_jsonl(source, entry["position"])
+
+        by_run = {}
+        for record in records:
+            by_run.setdefault(record.get("run_id") or "default", []).append(record)
+        for run_id, run_records in by_run.items():
+            partition = os.path.join(warehouse_dir, f"run_id={quote(str(run_id), safe='')}")
+            os.makedirs(partition, exist_ok=True)
+            part = len(glob.glob(os.path.join(partition, "*.parquet")))
+            pq.write_table(_to_table(run_records), os.path.join(partition, f"part-{part:05d}.parquet"), compression="zstd")
+
+        added += len(records)
+        state[key] = {"position": position}
+        # save after every source so an interrupted ingest never re-adds a file
+        _save_state(warehouse_dir, state)
+
+    return added
+
+
+def load(columns: list, warehouse_dir: str = WAREHOUSE_DIR, runs: list = None) -> pd.DataFrame:
+    """Read only `columns` (run_id is always included) for all or selected runs."""
+    files = glob.glob(os.path.join(warehouse_dir, "run_id=*", "*.parquet"))
+    if not files:
+        return pd.DataFrame(columns=["run_id"] + [c for c in columns if c != "run_id"])
+
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+    schema = schema.append(pa.field("run_id", pa.string()))
+    dataset = ds.dataset(files, schema=schema, format="parquet", partitioning="hive",
+                         partition_base_dir=warehouse_dir)
+
+    wanted = ["run_id"] + [c for c in columns if c != "run_id" and c in schema.names]
+    flt = ds.field("run_id").isin(runs) if runs else None
+    df = dataset.to_table(columns=wanted, filter=flt).to_pandas()
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+    return df
+
+
+def latest_records(columns: list, warehouse_dir: str = WAREHOUSE_DIR, runs: list = None) -> pd.DataFrame:
+    """One row per (run_id, task_id): the last logged record of each task."""
+    df = load(sorted(set(columns) | {"task_id", "timestamp"}), warehouse_dir, runs)
+    df = df.sort_values("timestamp").drop_duplicates(["run_id", "task_id"], keep="last")
+    return df.reset_index(drop=True)
+
+
+def run_ids(warehouse_dir: str = WAREHOUSE_DIR) -> list:
+    """Runs ordered by their last logged timestamp."""
+    df = load(["timestamp"], warehouse_dir)
+    return df.groupby("run_id")["timestamp"].max().sort_values().index.tolist()
+
+
+def pass_at_1_by_run(warehouse_dir: str = WAREHOUSE_DIR) -> pd.DataFrame:
+    df = latest_records(["result"], warehouse_dir)
+    df["passed"] = df["result"] == "pass"
+    summary = df.groupby("run_id").agg(tasks=("task_id", "size"), passes=("passed", "sum"))
+    summary["pass_at_1"] = (summary["passes"] / summary["tasks"] * 100).round(2)
+    return summary
+
+
+def bug_type_deltas(base_run: str, other_run: str, warehouse_dir: str = WAREHOUSE_DIR) -> pd.DataFrame:
+    """Pass rate per bug_type in both runs and the change from base_run to other_run."""
+    df = latest_records(["result", "bug_type"], warehouse_dir, [base_run, other_run])
+    df["passed"] = (df["result"] == "pass") * 100.0
+    rates = df.pivot_table(index="bug_type", columns="run_id", values="passed", aggfunc="mean")
+    rates = rates.reindex(columns=[base_run, other_run]).round(2)
+    rates["delta"] = rates[other_run] - rates[base_run]
+    return rates.sort_values("delta")
+
+
+def error_type_deltas(base_run: str, other_run: str, warehouse_dir: str = WAREHOUSE_DIR) -> pd.DataFrame:
+    """Failure counts per error_type in both runs and the change from base_run to other_run."""
+    df = latest_records(["result", "error_type"], warehouse_dir, [base_run, other_run])
+    fails = df[df["result"] == "fail"]
+    counts = pd.crosstab(fails["error_type"].fillna("None"), fails["run_id"])
+    counts = counts.reindex(columns=[base_run, other_run], fill_value=0)
+    counts["delta"] = counts[other_run] - counts[base_run]
+    return counts.sort_values("delta", ascending=False)
+
+
+def retry_distribution(warehouse_dir: str = WAREHOUSE_DIR) -> pd.DataFrame:
+    """Tasks per retry count, one column per run."""
+    df = latest_records(["retries"], warehouse_dir)
+    return pd.crosstab(df["retries"].fillna(0).astype(int), df["run_id"])
+
+
+def flipped_tasks(base_run: str, other_run: str, warehouse_dir: str = WAREHOUSE_DIR) -> pd.DataFrame:
+    """Tasks whose result differs between the two runs."""
+    df = latest_records(["result"], warehouse_dir, [base_run, other_run])
+    results = df.pivot(index="task_id", columns="run_id", values="result").reindex(columns=[base_run, other_run])
+    flipped = results.dropna()
+    flipped = flipped[flipped[base_run] != flipped[other_run]].copy()
+    flipped["change"] = flipped[base_run] + " -> " + flipped[other_run]
+    return flipped.sort_values("change")
+
+
+def print_comparison(base_run: str, other_run: str, warehouse_dir: str = WAREHOUSE_DIR):
+    print(f"\nComparing '{base_run}' -> '{other_run}'")
+    print("\nPass rate by bug_type (%):")
+    print(bug_type_deltas(base_run, other_run, warehouse_dir))
+    print("\nFailures by error_type:")
+    print(error_type_deltas(base_run, other_run, warehouse_dir))
+    flipped = flipped_tasks(base_run, other_run, warehouse_dir)
+    print(f"\nFlipped tasks: {len(flipped)}")
+    print(flipped["change"].value_counts())
+    print(flipped)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest results logs into a Parquet warehouse and compare runs.")
+    parser.add_argument("command", choices=["ingest", "report"])
+    parser.add_argument("--source", action="append", help="results log to ingest (default: data/processed/results_log*)")
+    parser.add_argument("--warehouse", default=WAREHOUSE_DIR)
+    parser.add_argument("--base", help="baseline run_id for the comparison (default: second latest run)")
+    parser.add_argument("--compare", help="run_id compared against the baseline (default: latest run)")
+    args = parser.parse_args()
+
+    added = ingest(args.source, args.warehouse)
+    print(f"Ingested {added} new records into {args.warehouse}")
+    if args.command == "report":
+        print("\nPass@1 per run:")
+        print(pass_at_1_by_run(args.warehouse))
+        print("\nRetry distribution:")
+        print(retry_distribution(args.warehouse))
+        runs = run_ids(args.warehouse)
+        base = args.base or (runs[-2] if len(runs) > 1 else None)
+        other = args.compare or (runs[-1] if runs else None)
+        if base and other and base != other:
+            print_comparison(base, other, args.warehouse)
@@ -0,0 +1,28 @@
+import sys
+
+from organized_agent.preflight import preflight_check
+
+# usage: python -m scripts.preflight_probes  (exits non-zero when a probe gets the wrong finding)
+
+# (name, code, expected diagnostic type or None)
+PROBES = [
+    # canonical solution of HumanEval/150: for/else with a dead break after the return
+    ("HumanEval/150 for-else", "def x_or_y(n, x, y):\n    if n == 1:\n        return y\n"
+     "    for i in range(2, n):\n        if n % i == 0:\n            return y\n            break\n"
+     "    else:\n        return x\n", None),
+    ("reachable break skips else", "def x_or_y(n, x, y):\n    for i in range(2, n):\n        if n % i == 0:\n"
+     "            break\n    else:\n        return x\n", "MissingReturn"),
+    ("break of a nested loop", "def x_or_y(n, x, y):\n    for i in range(n):\n        for j in range(n):\n"
+     "            break\n    else:\n        return x\n", None),
+    ("final assert False", "def x_or_y(n, x, y):\n    if n > 1:\n        return x\n    assert False\n", None),
+    ("final raise", "def x_or_y(n, x, y):\n    if n > 1:\n        return x\n    raise ValueError(n)\n", None),
+    ("falls through", "def x_or_y(n, x, y):\n    if n > 1:\n        return x\n", "MissingReturn"),
+]
+
+failures = 0
+for name, code, expected in PROBES:
+    diagnostic = preflight_check(code, "x_or_y", "def x_or_y(n, x, y):\n", "    return x\n")
+    found = diagnostic["type"] if diagnostic else None
+    failures += found != expected
+    print(f"{'ok  ' if found == expected else 'FAIL'} {name}: {found or 'no finding'}")
+sys.exit(1 if failures else 0)